@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+# Benchmark for the screenshot and description scraping (htmlextract) against
+# the BeautifulSoup + lxml parse it replaced.
+#
+#   ./benchmarks/bench_html.py [--runs N] [--fixture KIND:PATH ...]
+#
+# Without --fixture it runs on synthetic pages shaped like the ones we scrape:
+# a screenshots.debian.net package page and a Hamonikr board post. Real pages
+# saved with e.g. `curl -o debian.html https://screenshots.debian.net/package/gimp`
+# can be given instead, as debian:debian.html or hamonikr:hamonikr.html.
+#
+# The BeautifulSoup columns are only filled in when python3-bs4 and
+# python3-lxml are installed; their results are checked against ours.
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+MINTINSTALL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "usr", "lib", "linuxmint", "mintinstall")
+sys.path.insert(0, MINTINSTALL_DIR)
+
+import htmlextract
+
+# Same patterns mintinstall.py uses.
+DEBIAN_SCREENSHOT_RE = re.compile(r"/shrine/screenshot[/\d\w]*large-[\w\d]*.png")
+HAMONIKR_IMAGE_RE = re.compile(r"^https://hamonikr\.org")
+MAX_SCREENSHOTS = 4
+
+WORDS = ("screenshot", "package", "install", "application", "debian", "linux", "mint", "free", "software",
+         "the", "and", "for", "with", "desktop", "editor", "image", "video", "audio", "tool")
+
+def filler(rng, words):
+    return " ".join(rng.choice(WORDS) for i in range(words))
+
+def synthetic_debian_page(seed=0):
+    """ A package page: a big navigation header, a grid of screenshots, a long footer """
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>gimp - screenshots</title>"]
+    parts.append("<script>%s</script>" % ("var x = '<a href=\"/nope\">';" * 200))
+    parts.append("<link rel='stylesheet' href='/static/site.css'></head><body><nav><ul>")
+    for i in range(400):
+        parts.append("<li><a href='/packages/%s-%d'>%s</a></li>" % (rng.choice(WORDS), i, filler(rng, 2)))
+    parts.append("</ul></nav><main><div class='screenshots'>")
+    for i in range(12):
+        digest = "%032x" % rng.getrandbits(128)
+        parts.append("<div class='shot'><a href='/shrine/screenshot/%d/large-%s.png'>"
+                     "<img src='/shrine/screenshot/%d/small-%s.png' alt='%s'></a><p>%s</p></div>"
+                     % (i, digest, i, digest, filler(rng, 3), filler(rng, 20)))
+    parts.append("</div></main><footer>")
+    for i in range(800):
+        parts.append("<p>%s <a href='/about/%d'>more</a></p>" % (filler(rng, 12), i))
+    parts.append("</footer></body></html>")
+    return "".join(parts).encode("utf-8")
+
+def synthetic_hamonikr_page(seed=0):
+    """ A board post: theme markup, the xe_content block with nested divs and images, comments """
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html lang='ko'><head><meta charset='utf-8'>"]
+    parts.append("<style>%s</style>" % (".a{color:red}" * 500))
+    parts.append("</head><body><div id='header'>")
+    for i in range(300):
+        parts.append("<div class='menu'><a href='/board/%d'><img src='/layouts/icon%d.png'></a></div>" % (i, i % 10))
+    parts.append("</div><div class='document_1 xe_content'>")
+    for i in range(60):
+        parts.append("<div><p>%s 소프트웨어 설치 %s</p>" % (filler(rng, 25), filler(rng, 10)))
+        if i % 10 == 0:
+            parts.append("<img src='https://hamonikr.org/files/attach/images/%d.png'/>" % i)
+        parts.append("<script>alert('not text')</script></div>")
+    parts.append("</div><div class='comments'>")
+    for i in range(500):
+        parts.append("<div class='comment'><p>%s</p><img src='https://hamonikr.org/files/avatar/%d.png'></div>" % (filler(rng, 15), i))
+    parts.append("</div></body></html>")
+    return "".join(parts).encode("utf-8")
+
+def chunked(data, size=htmlextract.CHUNK_SIZE):
+    """ The page as response.iter_content() would hand it to us """
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def ours(kind, data):
+    if kind == "debian":
+        return htmlextract.find_links(chunked(data), "utf-8", "href", DEBIAN_SCREENSHOT_RE, limit=MAX_SCREENSHOTS)
+    links = htmlextract.find_links(chunked(data), "utf-8", "src", HAMONIKR_IMAGE_RE, tag="img", limit=MAX_SCREENSHOTS)
+    text = htmlextract.find_text(chunked(data), "utf-8", "div", "xe_content")
+    return links, text
+
+def beautifulsoup(kind, data):
+    from bs4 import BeautifulSoup
+    page = BeautifulSoup(data, "lxml")
+    if kind == "debian":
+        return [image['href'] for image in page.find_all(href=DEBIAN_SCREENSHOT_RE)][:MAX_SCREENSHOTS]
+    links = [image['src'] for image in page.find_all('img') if image.get('src', '').startswith('https://hamonikr.org')]
+    # The old code parsed the same page a second time for the description.
+    text = BeautifulSoup(data, "lxml").find("div", "xe_content").get_text()
+    return links[:MAX_SCREENSHOTS], text
+
+def measure(func, kind, data, runs):
+    best = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = func(kind, data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(kind, data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+def normalize(result):
+    """ Whitespace differs between the parsers' text output, the words don't """
+    if isinstance(result, tuple):
+        return result[0], " ".join((result[1] or "").split())
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="htmlextract against BeautifulSoup on screenshot/description pages")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--fixture", action="append", default=[], metavar="KIND:PATH",
+                        help="a saved page, KIND is debian or hamonikr (repeatable)")
+    args = parser.parse_args()
+
+    fixtures = []
+    for spec in args.fixture:
+        kind, path = spec.split(":", 1)
+        if kind not in ("debian", "hamonikr"):
+            parser.error("unknown fixture kind: %s" % kind)
+        with open(path, "rb") as f:
+            fixtures.append((kind, path, f.read()))
+    if not fixtures:
+        fixtures = [("debian", "synthetic", synthetic_debian_page()),
+                    ("hamonikr", "synthetic", synthetic_hamonikr_page())]
+
+    try:
+        import bs4, lxml
+        have_bs4 = True
+    except ImportError:
+        have_bs4 = False
+        print("python3-bs4/python3-lxml not installed, only measuring htmlextract\n")
+
+    print("%-9s %-12s %8s %12s %10s %12s %10s %s" % ("page", "fixture", "KB", "extract ms", "peak KB", "bs4 ms", "peak KB", "same"))
+    for kind, name, data in fixtures:
+        result, elapsed, peak = measure(ours, kind, data, args.runs)
+        row = "%-9s %-12s %8.0f %12.2f %10.0f" % (kind, os.path.basename(name)[:12], len(data) / 1024, elapsed * 1000, peak / 1024)
+
+        if have_bs4:
+            bs_result, bs_elapsed, bs_peak = measure(beautifulsoup, kind, data, args.runs)
+            same = normalize(result) == normalize(bs_result)
+            row += " %12.2f %10.0f %s" % (bs_elapsed * 1000, bs_peak / 1024, "yes" if same else "NO")
+        print(row)
+
+if __name__ == "__main__":
+    main()
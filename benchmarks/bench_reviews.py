@@ -0,0 +1,349 @@
+#!/usr/bin/python3
+
+# Benchmarks for the review cache.
+#
+#   ./benchmarks/bench_reviews.py startup [--reviews N]
+#   ./benchmarks/bench_reviews.py memory [--reviews N] [--keep FRACTION]
+#   ./benchmarks/bench_reviews.py pipeline [--sizes N,N,...] [--no-compression]
+#
+# Each measurement runs in a fresh interpreter so that peak RSS reflects only
+# the loader being measured. Needs the same runtime dependencies as mintinstall
+# itself (python3-gi, python3-requests).
+
+import argparse
+import functools
+import gc
+import gzip
+import http.server
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+MINTINSTALL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "usr", "lib", "linuxmint", "mintinstall")
+sys.path.insert(0, MINTINSTALL_DIR)
+
+WORDS = ("great", "works", "fine", "crashes", "on", "startup", "easy", "to", "use", "fast", "slow",
+         "recommended", "the", "best", "app", "for", "this", "job", "missing", "features", "love", "it")
+
+def synthetic_reviews(num_reviews, num_packages, seed=0):
+    """ Yields (package, date, username, rating, comment) tuples, grouped by package like new-reviews.list """
+    rng = random.Random(seed)
+    per_package = max(1, num_reviews // num_packages)
+    produced = 0
+    package = 0
+    while produced < num_reviews:
+        name = "package-%d" % package
+        count = min(rng.randint(1, per_package * 2), num_reviews - produced)
+        for i in range(count):
+            date = 1262304000 + rng.randint(0, 14 * 365 * 86400)
+            username = "user%d" % rng.randint(0, num_reviews // 4)
+            comment = " ".join(rng.choice(WORDS) for w in range(rng.randint(3, 40)))
+            yield name, date, username, rng.randint(1, 5), comment
+        produced += count
+        package += 1
+
+def synthetic_lines(num_reviews, num_packages):
+    """ The same reviews, as new-reviews.list lines """
+    return [("%s~~~%d~~~%s~~~%d~~~%s" % review).encode() for review in synthetic_reviews(num_reviews, num_packages)]
+
+def write_review_list(path, num_reviews, num_packages):
+    """ Writes a synthetic new-reviews.list, returns its size in bytes """
+    with open(path, "wb") as f:
+        for review in synthetic_reviews(num_reviews, num_packages):
+            f.write(("%s~~~%d~~~%s~~~%d~~~%s\n" % review).encode())
+        return f.tell()
+
+def build_cache(num_reviews, num_packages):
+    import reviews
+
+    cache = {}
+    for name, date, username, rating, comment in synthetic_reviews(num_reviews, num_packages):
+        info = cache.setdefault(name, reviews.ReviewInfo(name))
+        info.reviews.append(reviews.Review(name, date, username, rating, comment))
+    for info in cache.values():
+        info.update_stats()
+    return cache
+
+def write_legacy_json(path, cache, size):
+    """ Writes the cache the way the old loader saved reviews.json """
+    json_cache = {}
+    for name, info in cache.items():
+        json_cache[name] = {"name": name,
+                            "reviews": [{"packagename": r.packagename, "date": r.date, "username": r.username,
+                                         "rating": r.rating, "comment": r.comment, "version": None} for r in info.reviews],
+                            "categories": [],
+                            "version": None,
+                            "score": info.score,
+                            "avg_rating": info.avg_rating,
+                            "num_reviews": info.num_reviews}
+
+    with open(path, "w", encoding="utf8") as f:
+        json.dump({"cache": json_cache, "size": size}, f, indent=4)
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def child_startup(loader, path):
+    import reviews
+
+    baseline = max_rss_kb()
+    start = time.perf_counter()
+
+    if loader == "json":
+        with open(path, "r", encoding="utf8") as f:
+            cache = reviews.JsonObject.from_json(json.load(f)).cache
+    else:
+        cache = reviews.ReviewStore(path)
+
+    loaded = time.perf_counter()
+
+    # What the landing page needs: a score for every package.
+    total = 0.0
+    for name in cache:
+        total += cache[name].score
+
+    stats = time.perf_counter()
+
+    print(json.dumps({"load_ms": (loaded - start) * 1000,
+                      "stats_ms": (stats - loaded) * 1000,
+                      "rss_kb": max_rss_kb() - baseline}))
+
+def child_pipeline(url, store_path):
+    import reviews
+
+    start = time.perf_counter()
+    cache, meta, changed = reviews.sync_reviews(url, {}, {})
+    synced = time.perf_counter()
+    reviews.ReviewStore.write(store_path, cache, meta)
+    saved = time.perf_counter()
+    sync_rss = max_rss_kb()
+    num_reviews = sum(info.num_reviews for info in cache.values())
+    del cache, changed
+
+    start_load = time.perf_counter()
+    store = reviews.ReviewStore(store_path)
+    ranking = store.ranked_names()
+    total = 0.0
+    for name in ranking:
+        total += store[name].score
+    loaded = time.perf_counter()
+
+    print(json.dumps({"reviews": num_reviews,
+                      "bytes": meta["size"],
+                      "sync_s": synced - start,
+                      "save_s": saved - synced,
+                      "store_bytes": os.path.getsize(store_path),
+                      "load_s": loaded - start_load,
+                      "rss_kb": sync_rss}))
+
+class ListHandler(http.server.SimpleHTTPRequestHandler):
+    """ Serves files, or their pre-compressed .gz twin to clients accepting gzip, and counts bytes sent """
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if self.server.compress and "gzip" in self.headers.get("Accept-Encoding", "") and os.path.exists(path + ".gz"):
+            f = open(path + ".gz", "rb")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            return f
+        return super().send_head()
+
+    def copyfile(self, source, outputfile):
+        self.server.bytes_sent += os.fstat(source.fileno()).st_size
+        super().copyfile(source, outputfile)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_directory(path, compress):
+    """ Serves path over HTTP on a free local port, returns the server """
+    handler = functools.partial(ListHandler, directory=path)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.compress = compress
+    server.bytes_sent = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class LegacyReview:
+    """ Review as it was before __slots__ and interning, for comparison """
+    def __init__(self, packagename, date, username, rating, comment, version=None):
+        self.packagename = packagename
+        self.date = date
+        self.username = username
+        self.rating = rating
+        self.comment = comment
+        self.version = version
+
+class LegacyReviewInfo:
+    def __init__(self, name):
+        self.name = name
+        self.reviews = []
+        self.categories = []
+        self.version = None
+        self.score = 0.0
+        self.avg_rating = 0.0
+        self.num_reviews = 0
+
+def build_legacy(lines):
+    cache = {}
+    for line in lines:
+        elements = line.decode().split("~~~")
+        info = cache.setdefault(elements[0], LegacyReviewInfo(elements[0]))
+        info.reviews.append(LegacyReview(elements[0], elements[1], elements[2], int(elements[3]), elements[4]))
+    return cache
+
+def build_compact(lines):
+    import reviews
+
+    cache = {}
+    for line in lines:
+        review = reviews.parse_review_line(line)
+        info = cache.setdefault(review.packagename, reviews.ReviewInfo(review.packagename))
+        info.reviews.append(review)
+    return cache
+
+def traced(build):
+    """ Returns (result, retained bytes, peak bytes) of build() """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+def bench_memory(args):
+    # Imported before tracing starts, or the module (and requests, gi) would count as
+    # memory held by the compact objects.
+    import reviews
+
+    lines = synthetic_lines(args.reviews, args.packages)
+
+    legacy, legacy_current, legacy_peak = traced(lambda: build_legacy(lines))
+    del legacy
+
+    compact, compact_current, compact_peak = traced(lambda: build_compact(lines))
+
+    names = sorted(compact.keys())
+    keep = set(random.Random(1).sample(names, int(len(names) * args.keep)))
+
+    def prune():
+        return {name: info for name, info in build_compact(lines).items() if name in keep}
+
+    del compact
+    pruned, pruned_current, pruned_peak = traced(prune)
+
+    print("%d reviews in %d packages, tracemalloc:" % (args.reviews, len(names)))
+    print()
+    print("%-28s %12s %12s" % ("", "retained KB", "peak KB"))
+    print("%-28s %12d %12d" % ("__dict__ objects", legacy_current // 1024, legacy_peak // 1024))
+    print("%-28s %12d %12d" % ("__slots__ + interning", compact_current // 1024, compact_peak // 1024))
+    print("%-28s %12d %12d" % ("... keeping %d%% of packages" % (args.keep * 100), pruned_current // 1024, pruned_peak // 1024))
+    print()
+    print("saved: %.1f%% (%.1f%% with pruning)" % (100 - compact_current * 100 / legacy_current,
+                                                   100 - pruned_current * 100 / legacy_current))
+
+def bench_pipeline(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = serve_directory(tmp, not args.no_compression)
+        url_base = "http://127.0.0.1:%d/" % server.server_address[1]
+
+        print("%10s %10s %10s %10s %10s %12s %10s %10s %12s" % ("lines", "list MB", "sent MB", "store MB",
+                                                              "sync s", "lines/s", "save s", "load s", "peak RSS MB"))
+        try:
+            for size in sizes:
+                list_name = "reviews-%d.list" % size
+                list_path = os.path.join(tmp, list_name)
+                write_review_list(list_path, size, max(1, size // args.per_package))
+                with open(list_path, "rb") as src, gzip.open(list_path + ".gz", "wb") as dst:
+                    dst.write(src.read())
+                store_path = os.path.join(tmp, "reviews-%d.bin" % size)
+
+                server.bytes_sent = 0
+                result = run_child("pipeline", url_base + list_name, store_path)
+                print("%10d %10.1f %10.1f %10.1f %10.2f %12d %10.2f %10.3f %12.1f" % (size,
+                                                                                    result["bytes"] / 1024 / 1024,
+                                                                                    server.bytes_sent / 1024 / 1024,
+                                                                                    result["store_bytes"] / 1024 / 1024,
+                                                                                    result["sync_s"],
+                                                                                    size / result["sync_s"],
+                                                                                    result["save_s"],
+                                                                                    result["load_s"],
+                                                                                    result["rss_kb"] / 1024))
+                os.unlink(list_path)
+                os.unlink(list_path + ".gz")
+                os.unlink(store_path)
+        finally:
+            server.shutdown()
+
+def run_child(*args):
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__), "child"] + [str(a) for a in args])
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+def bench_startup(args):
+    import reviews
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = build_cache(args.reviews, args.packages)
+        json_path = os.path.join(tmp, "reviews.json")
+        store_path = os.path.join(tmp, "reviews.bin")
+
+        write_legacy_json(json_path, cache, 0)
+        reviews.ReviewStore.write(store_path, cache, {"size": 0})
+
+        print("%d reviews in %d packages" % (args.reviews, len(cache)))
+        print("  reviews.json  %8.1f KB" % (os.path.getsize(json_path) / 1024))
+        print("  reviews.bin   %8.1f KB" % (os.path.getsize(store_path) / 1024))
+        print()
+        print("%-8s %10s %10s %10s" % ("loader", "load ms", "stats ms", "RSS KB"))
+
+        for loader, path in (("json", json_path), ("store", store_path)):
+            results = [run_child("startup", loader, path) for i in range(args.runs)]
+            best = min(results, key=lambda r: r["load_ms"] + r["stats_ms"])
+            print("%-8s %10.1f %10.1f %10d" % (loader, best["load_ms"], best["stats_ms"], best["rss_kb"]))
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "child":
+        if sys.argv[2] == "startup":
+            child_startup(sys.argv[3], sys.argv[4])
+        elif sys.argv[2] == "pipeline":
+            child_pipeline(sys.argv[3], sys.argv[4])
+        return
+
+    parser = argparse.ArgumentParser(description="mintinstall review cache benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup = subparsers.add_parser("startup", help="startup cost and RSS of the legacy JSON loader against reviews.bin")
+    startup.add_argument("--reviews", type=int, default=50000)
+    startup.add_argument("--packages", type=int, default=8000)
+    startup.add_argument("--runs", type=int, default=3)
+    startup.set_defaults(func=bench_startup)
+
+    memory = subparsers.add_parser("memory", help="tracemalloc comparison of the review objects")
+    memory.add_argument("--reviews", type=int, default=100000)
+    memory.add_argument("--packages", type=int, default=8000)
+    memory.add_argument("--keep", type=float, default=0.6, help="fraction of packages present in the installer cache")
+    memory.set_defaults(func=bench_memory)
+
+    pipeline = subparsers.add_parser("pipeline", help="download, parse, save and load of synthetic review lists served locally")
+    pipeline.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated line counts")
+    pipeline.add_argument("--per-package", type=int, default=12, help="average reviews per package")
+    pipeline.add_argument("--no-compression", action="store_true", help="serve the lists without gzip")
+    pipeline.set_defaults(func=bench_pipeline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
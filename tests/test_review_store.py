@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+
+# The compressed review store (reviews.bin, reviews.ReviewStore): writing and
+# reading it back, decoding only the newest reviews, reading version 2 files
+# and copying blocks of unchanged packages as they are.
+#
+#   python3 -m unittest discover tests
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "usr", "lib", "linuxmint", "mintinstall"))
+
+import_error = None
+try:
+    import reviews
+except ImportError as e:
+    # reviews needs gi (python3-gi) and requests.
+    reviews = None
+    import_error = e
+
+WORDS = ("great", "works", "fine", "crashes", "on", "startup", "easy", "to", "use", "fast", "slow")
+
+def make_cache(num_packages=30, seed=0):
+    rng = random.Random(seed)
+    cache = {}
+    for i in range(num_packages):
+        name = "package-%d" % i
+        info = reviews.ReviewInfo(name)
+        for j in range(rng.randint(1, 12)):
+            comment = " ".join(rng.choice(WORDS) for k in range(rng.randint(0, 30)))
+            info.reviews.append(reviews.Review(name, 1500000000 + rng.randint(0, 10 ** 8), "user%d" % j,
+                                               rng.randint(1, 5), comment))
+        info.update_stats()
+        cache[name] = info
+    return cache
+
+def snapshot(cache):
+    """ Everything about a cache that is shown or stored """
+    return {
+        name: (info.num_reviews, info.avg_rating, info.score, tuple(info.stars),
+               [(r.packagename, r.date, r.username, r.rating, r.comment) for r in info.reviews])
+        for name, info in cache.items()
+    }
+
+def write_v2(path, cache, meta):
+    """ A version 2 store: same layout as version 3, with uncompressed blocks """
+    names = reviews.ranked_names(cache)
+    names_data = "\n".join(names).encode()
+    meta_data = json.dumps(meta).encode()
+
+    meta_offset = reviews.STORE_HEADER.size
+    names_offset = meta_offset + len(meta_data)
+    index_offset = names_offset + len(names_data)
+    data_offset = index_offset + len(names) * reviews.STORE_RECORD.size
+
+    index = bytearray()
+    blocks = []
+    for name in names:
+        info = cache[name]
+        block = zlib.decompress(info.encode_reviews())
+        index += reviews.STORE_RECORD.pack(info.avg_rating, info.score, info.num_reviews, data_offset, len(block), *info.stars)
+        blocks.append(block)
+        data_offset += len(block)
+
+    header = reviews.STORE_HEADER.pack(reviews.STORE_MAGIC, 2, reviews.STORE_FLAG_RANKED, len(names),
+                                       sum(info.num_reviews for info in cache.values()),
+                                       meta_offset, len(meta_data), names_offset, len(names_data), index_offset)
+    with open(path, "wb") as f:
+        f.write(header + meta_data + names_data + index + b"".join(blocks))
+
+@unittest.skipIf(reviews is None, "reviews can't be imported: %s" % import_error)
+class ReviewStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "reviews.bin")
+        self.meta = {"size": 1234, "etag": "\"abc\""}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        cache = make_cache()
+        reviews.ReviewStore.write(self.path, cache, self.meta)
+
+        store = reviews.ReviewStore(self.path)
+
+        self.assertTrue(store.compressed)
+        self.assertEqual(store.meta, self.meta)
+        self.assertEqual(store.num_reviews, sum(info.num_reviews for info in cache.values()))
+        self.assertEqual(store.ranked_names(), reviews.ranked_names(cache))
+        self.assertEqual(snapshot(store), snapshot(cache))
+        self.assertEqual(os.listdir(self.dir), ["reviews.bin"])
+
+    def test_only_known_packages_are_visible(self):
+        cache = make_cache()
+        reviews.ReviewStore.write(self.path, cache, self.meta)
+
+        store = reviews.ReviewStore(self.path, {"package-1", "package-2", "not-reviewed"})
+
+        self.assertEqual(set(store), {"package-1", "package-2"})
+        self.assertEqual(snapshot(store), snapshot({name: cache[name] for name in ("package-1", "package-2")}))
+
+    def test_latest_reviews_inflate_part_of_the_block(self):
+        cache = make_cache(num_packages=1)
+        info = cache["package-0"]
+        rng = random.Random(1)
+        # Random comments don't compress much, so the block is many STORE_DECOMPRESS_STEPs long.
+        info.reviews = [reviews.Review("package-0", 1500000000 + i, "user%d" % i, 1 + i % 5,
+                                       "%x" % rng.getrandbits(8192)) for i in range(200)]
+        info.update_stats()
+        reviews.ReviewStore.write(self.path, cache, self.meta)
+
+        store = reviews.ReviewStore(self.path)
+        block_length = len(store.read_block(0))
+        self.assertGreater(block_length, 20 * reviews.STORE_DECOMPRESS_STEP)
+
+        inflated = []
+        payload = store._payload
+        def counting_payload(block, step):
+            for data in payload(block, step):
+                inflated.append(step)
+                yield data
+        store._payload = counting_payload
+
+        latest = store["package-0"].latest_reviews(3)
+
+        self.assertEqual([(r.date, r.username, r.comment) for r in latest],
+                         [(r.date, r.username, r.comment) for r in info.reviews[:3]])
+        self.assertLess(sum(inflated), block_length / 4)
+        # Asking for the newest reviews doesn't decode the rest.
+        self.assertIsNone(store["package-0"]._reviews)
+
+    def test_version_2_file_is_read(self):
+        cache = make_cache()
+        write_v2(self.path, cache, self.meta)
+
+        store = reviews.ReviewStore(self.path)
+
+        self.assertFalse(store.compressed)
+        self.assertEqual(store.meta, self.meta)
+        self.assertEqual(snapshot(store), snapshot(cache))
+        self.assertEqual([r.username for r in store["package-3"].latest_reviews(2)],
+                         [r.username for r in cache["package-3"].reviews[:2]])
+
+        # Written out again as version 3 on the next sync.
+        upgraded = os.path.join(self.dir, "upgraded.bin")
+        reviews.ReviewStore.write(upgraded, store, self.meta)
+        self.assertTrue(reviews.ReviewStore(upgraded).compressed)
+        self.assertEqual(snapshot(reviews.ReviewStore(upgraded)), snapshot(cache))
+
+    def test_unchanged_packages_are_copied_verbatim(self):
+        cache = make_cache()
+        reviews.ReviewStore.write(self.path, cache, self.meta)
+        store = reviews.ReviewStore(self.path)
+
+        # What a delta sync hands to the store: the old entries, with one package replaced.
+        merged = {name: store[name] for name in store}
+        changed = reviews.ReviewInfo("package-5")
+        changed.reviews = list(store["package-5"].reviews) + [reviews.Review("package-5", 1700000000, "new", 1, "meh")]
+        changed.update_stats()
+        merged["package-5"] = changed
+
+        rewritten = os.path.join(self.dir, "rewritten.bin")
+        reviews.ReviewStore.write(rewritten, merged, self.meta)
+        new_store = reviews.ReviewStore(rewritten)
+
+        for name in store:
+            if name == "package-5":
+                continue
+            # Never decoded, and the compressed block is the same bytes.
+            self.assertIsNone(store[name]._reviews)
+            self.assertEqual(new_store.read_block(new_store._slots[name]), store.read_block(store._slots[name]))
+
+        self.assertEqual(snapshot(new_store), snapshot(merged))
+        self.assertEqual(new_store["package-5"].num_reviews, cache["package-5"].num_reviews + 1)
+
+if __name__ == "__main__":
+    unittest.main()
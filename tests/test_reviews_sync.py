@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+
+# Incremental sync of new-reviews.list (reviews.sync_reviews) against a local
+# stand-in for community.linuxmint.com that serves a file (gzip-compressed when
+# asked, like the real one) that we grow, rewrite and truncate between syncs.
+# Every sync result is compared with a full download of the same file.
+#
+#   python3 -m unittest discover tests
+
+import gzip
+import hashlib
+import http.server
+import os
+import re
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "usr", "lib", "linuxmint", "mintinstall"))
+
+import_error = None
+try:
+    import reviews
+except ImportError as e:
+    # reviews needs gi (python3-gi) and requests.
+    reviews = None
+    import_error = e
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """
+    Serves self.body with an ETag and Range requests, gzip-compressed when
+    asked for it like the real server. Logs the requests it got and the
+    Content-Encoding of each reply.
+    """
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.body = b""
+        self.gzip = True
+        self.requests = []
+        self.encodings = []
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d/data/new-reviews.list" % self.server_address[1]
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        body = server.body
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        server.requests.append(dict(self.headers))
+        server.encodings.append(None)
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%d" % len(body))
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, len(body) - 1, len(body)))
+            self.send_body(body[start:], etag)
+            return
+
+        self.send_response(200)
+        if server.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+            server.encodings[-1] = "gzip"
+        self.send_body(body, etag)
+
+    def send_body(self, body, etag):
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+def review_line(package, date, user, rating, comment="fine"):
+    return ("%s~~~%d~~~%s~~~%d~~~%s\n" % (package, date, user, rating, comment)).encode()
+
+def initial_list():
+    lines = []
+    for i in range(400):
+        package = "package-%d" % (i % 37)
+        lines.append(review_line(package, 1500000000 + i * 60, "user%d" % (i % 23), 1 + i % 5, "review %d" % i))
+    # A line that isn't a review is skipped by both paths.
+    lines.insert(100, b"garbage\n")
+    return b"".join(lines)
+
+def snapshot(cache):
+    """ Everything about a cache that is shown or stored """
+    return {
+        name: (info.num_reviews, info.avg_rating, info.score, info.stars,
+               [(r.packagename, r.date, r.username, r.rating, r.comment) for r in info.reviews])
+        for name, info in cache.items()
+    }
+
+@unittest.skipIf(reviews is None, "reviews can't be imported: %s" % import_error)
+class DeltaSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        self.server.body = initial_list()
+        self.cache, self.meta, changed = reviews.sync_reviews(self.server.url, {}, {})
+        self.assertEqual(set(changed), set(self.cache.keys()))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sync(self):
+        del self.server.requests[:]
+        del self.server.encodings[:]
+        return reviews.sync_reviews(self.server.url, self.cache, self.meta)
+
+    def full_sync(self):
+        cache, meta, changed = reviews.sync_reviews(self.server.url, {}, {})
+        return cache
+
+    def assertSameAsFullSync(self, cache):
+        self.assertEqual(snapshot(cache), snapshot(self.full_sync()))
+
+    def assertCompressed(self, request):
+        """ The request was a full download, asked for gzip and got it """
+        self.assertNotIn("Range", self.server.requests[request])
+        self.assertIn("gzip", self.server.requests[request].get("Accept-Encoding", ""))
+        self.assertEqual(self.server.encodings[request], "gzip")
+
+    def test_full_download_is_compressed(self):
+        del self.server.requests[:]
+        del self.server.encodings[:]
+
+        cache = self.full_sync()
+
+        self.assertCompressed(0)
+        self.assertEqual(snapshot(cache), snapshot(self.cache))
+        # Sizes are counted on the uncompressed list, that's what Range requests refer to.
+        self.assertEqual(self.meta["size"], len(self.server.body))
+
+    def test_uncompressed_download(self):
+        self.server.gzip = False
+        self.server.body += review_line("package-1", 1600000000, "x", 3)
+
+        cache = self.full_sync()
+
+        self.assertIsNone(self.server.encodings[-1])
+        self.assertEqual(cache["package-1"].num_reviews, self.cache["package-1"].num_reviews + 1)
+
+    def test_unchanged_list_is_not_downloaded(self):
+        self.assertIsNone(self.sync())
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_appended_lines_are_merged(self):
+        appended = b"".join([
+            review_line("package-3", 1600000000, "user3", 5),       # a package that has reviews
+            review_line("package-3", 1600000060, "user3", 1),       # the same user again
+            review_line("package-new", 1600000120, "newcomer", 4),  # a package that had none
+        ])
+        self.server.body += appended
+
+        cache, meta, changed = self.sync()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertIn("Range", self.server.requests[0])
+        # Ranges are asked for uncompressed.
+        self.assertEqual(self.server.requests[0].get("Accept-Encoding"), "identity")
+        self.assertIsNone(self.server.encodings[0])
+        self.assertEqual(changed, {"package-3", "package-new"})
+        self.assertEqual(meta["size"], len(self.server.body))
+        # Packages that didn't change are carried over as they were.
+        self.assertIs(cache["package-4"], self.cache["package-4"])
+        self.assertSameAsFullSync(cache)
+
+    def test_repeated_syncs_match_a_full_download(self):
+        cache, meta = self.cache, self.meta
+        for step in range(5):
+            self.server.body += b"".join(review_line("package-%d" % ((step * 7 + i) % 40), 1600000000 + step * 1000 + i,
+                                                     "user%d" % (i % 3), 1 + (step + i) % 5) for i in range(10))
+            self.cache, self.meta = cache, meta
+            cache, meta, changed = self.sync()
+            self.assertIn("Range", self.server.requests[0])
+
+        self.assertSameAsFullSync(cache)
+
+    def test_line_split_across_syncs(self):
+        # The server caught the file halfway through writing a line.
+        line = review_line("package-5", 1600000000, "halfway", 2)
+        self.server.body += line[:10]
+        self.cache, self.meta, changed = self.sync()
+        self.server.body += line[10:]
+
+        cache, meta, changed = self.sync()
+
+        self.assertIn("halfway", [r.username for r in cache["package-5"].reviews])
+        self.assertSameAsFullSync(cache)
+
+    def test_rewritten_list_is_downloaded_again(self):
+        self.server.body = self.server.body.replace(b"review 399", b"edited 399") + review_line("package-1", 1600000000, "x", 3)
+
+        cache, meta, changed = self.sync()
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertCompressed(1)
+        self.assertSameAsFullSync(cache)
+
+    def test_truncated_list_is_downloaded_again(self):
+        self.server.body = initial_list()[:2000]
+        self.server.body = self.server.body[:self.server.body.rindex(b"\n") + 1]
+
+        cache, meta, changed = self.sync()
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertCompressed(1)
+        self.assertSameAsFullSync(cache)
+        self.assertEqual(meta["size"], len(self.server.body))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from gi.repository import GLib
+
+from misc import atomic_write
+
+DESCRIPTION_CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "descriptions")
+
+# Descriptions younger than this are shown without asking the server.
+MAX_AGE = 3 * (60 * 60 * 24) # days
+# housekeeping deletes entries that haven't been refreshed for this long.
+EXPIRE_AGE = 30 * (60 * 60 * 24) # days
+
+class Entry:
+    """
+    A description fetched from a third party site, or None for a package
+    the site has no description for.
+    """
+    def __init__(self, text: Optional[str], fetched: float):
+        self.text = text
+        self.fetched = fetched
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched < MAX_AGE
+
+def _path(source: str, name: str) -> str:
+    return os.path.join(DESCRIPTION_CACHE_DIR, source, name + ".json")
+
+def lookup(source: str, name: str) -> Optional[Entry]:
+    try:
+        with open(_path(source, name), "r") as f:
+            data = json.load(f)
+        return Entry(data["text"], data["fetched"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def store(source: str, name: str, text: Optional[str]) -> None:
+    path = _path(source, name)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump({"text": text, "fetched": time.time()}, f)
+    except OSError as e:
+        print("MintInstall: Could not cache %s description for %s: %s" % (source, name, e))
+
+def clean(stop_event: Optional[threading.Event] = None, max_age: float = EXPIRE_AGE) -> None:
+    """ Deletes entries (and leftover temporary files) last written more than max_age ago """
+    cutoff = time.time() - max_age
+    for root, dirs, files in os.walk(DESCRIPTION_CACHE_DIR):
+        for name in files:
+            if stop_event is not None and stop_event.is_set():
+                return
+
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
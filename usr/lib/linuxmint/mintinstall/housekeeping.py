@@ -2,55 +2,75 @@ import sys
 if sys.version_info.major < 3:
     raise "python3 required"
 
-from gi.repository import GLib
-
 import time
 import os
 import threading
-import multiprocessing
-from pathlib import Path
 
-SCREENSHOT_DIR = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "screenshots")
+import iconcache
+import descriptioncache
+import screenshotcache
+
+from screenshotcache import SCREENSHOT_DIR, SCREENSHOT_THUMBNAIL_DIR
 
 MAX_AGE = 14 * (60 * 60 * 24) # days
+# Files the manifest doesn't know about (from before it existed, or left over
+# from an interrupted download) are deleted once they're this old.
+ORPHAN_AGE = 60 * 60 # hour
 
-proc = None
+stop_event = threading.Event()
 
 def run():
-    print("MintInstall: Deleting old screenshots")
+    print("MintInstall: Deleting old screenshots and descriptions, trimming the icon cache")
 
-    thread = threading.Thread(target=_clean_screenshots_thread)
+    stop_event.clear()
+    thread = threading.Thread(target=_housekeeping_thread, daemon=True)
     thread.start()
 
-def _clean_screenshots_thread():
-    global proc
-
-    proc = multiprocessing.Process(target=_clean_screenshots_process)
-    proc.start()
+def _housekeeping_thread():
+    _clean_screenshots()
+    if not stop_event.is_set():
+        iconcache.trim(stop_event)
+    if not stop_event.is_set():
+        descriptioncache.clean(stop_event)
 
-    proc.join()
+def _clean_screenshots():
+    for path in screenshotcache.expire(MAX_AGE):
+        _unlink(path)
 
-    proc = None
+    referenced = screenshotcache.referenced_files()
+    referenced.add(screenshotcache.MANIFEST_NAME)
 
-def _clean_screenshots_process():
-    ss_location = Path(SCREENSHOT_DIR)
+    for directory in (SCREENSHOT_DIR, SCREENSHOT_THUMBNAIL_DIR):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
 
-    screenshots = ss_location.glob("*.*")
+        for name in names:
+            if stop_event.is_set():
+                return
 
-    for p in screenshots:
-        try:
-            mtime = os.path.getmtime(str(p))
+            # Thumbnails go with their original: foo_1@2.png -> foo_1.png
+            if directory == SCREENSHOT_THUMBNAIL_DIR:
+                original = screenshotcache.thumbnail_original(name)
+            else:
+                original = name
 
-            if (time.time() - MAX_AGE) > mtime:
-                p.unlink()
-        except OSError:
-            pass
+            if original in referenced:
+                continue
 
-def kill():
-    global proc
+            path = os.path.join(directory, name)
+            try:
+                if os.path.isfile(path) and time.time() - os.path.getmtime(path) > ORPHAN_AGE:
+                    os.unlink(path)
+            except OSError:
+                pass
 
+def _unlink(path):
     try:
-        proc.terminate()
-        proc = None
-    except AttributeError as e:
+        os.unlink(path)
+    except OSError:
         pass
+
+def kill():
+    stop_event.set()
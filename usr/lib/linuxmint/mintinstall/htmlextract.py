@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+# Pulls the few things mintinstall needs out of third party web pages (image
+# links, one block of text) while the page is still downloading. The page is
+# never turned into a tree, and reading stops as soon as we have what we came for.
+
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Pattern
+
+CHUNK_SIZE = 16 * 1024
+
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+# Text inside these never shows up in a page's content.
+_SKIPPED_ELEMENTS = ("script", "style", "template")
+# Elements with no end tag; they don't nest.
+_VOID_ELEMENTS = ("area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+                  "meta", "param", "source", "track", "wbr")
+
+def encoding_of(response) -> str:
+    """ The charset from a requests.Response's Content-Type, or utf-8 """
+    match = _CHARSET_RE.search(response.headers.get("Content-Type", ""))
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+def response_chunks(response) -> Iterable[bytes]:
+    return response.iter_content(chunk_size=CHUNK_SIZE)
+
+class _Extractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+
+    def run(self, chunks: Iterable[bytes], encoding: str) -> None:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        for chunk in chunks:
+            self.feed(decoder.decode(chunk))
+            if self.done:
+                return
+
+        self.feed(decoder.decode(b"", final=True))
+        self.close()
+
+class _LinkExtractor(_Extractor):
+    def __init__(self, attr: str, pattern: Optional[Pattern], tag: Optional[str], limit: Optional[int]):
+        super().__init__()
+        self.attr = attr
+        self.pattern = pattern
+        self.tag = tag
+        self.limit = limit
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done or (self.tag is not None and tag != self.tag):
+            return
+
+        for name, value in attrs:
+            if name == self.attr and value is not None:
+                if self.pattern is None or self.pattern.search(value):
+                    self.links.append(value)
+                    self.done = self.limit is not None and len(self.links) >= self.limit
+                break
+
+    handle_startendtag = handle_starttag
+
+class _TextExtractor(_Extractor):
+    def __init__(self, tag: str, css_class: str):
+        super().__init__()
+        self.tag = tag
+        self.css_class = css_class
+        self.depth = 0 # of self.tag elements, once inside the block
+        self.skipping = 0
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+
+        if self.depth == 0:
+            if tag == self.tag:
+                classes = dict(attrs).get("class") or ""
+                if self.css_class in classes.split():
+                    self.depth = 1
+            return
+
+        if tag == self.tag:
+            self.depth += 1
+        elif tag in _SKIPPED_ELEMENTS:
+            self.skipping += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in _VOID_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.done or self.depth == 0:
+            return
+
+        if tag == self.tag:
+            self.depth -= 1
+            self.done = self.depth == 0
+        elif tag in _SKIPPED_ELEMENTS and self.skipping > 0:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if self.depth > 0 and self.skipping == 0 and not self.done:
+            self.parts.append(data)
+
+def find_links(chunks: Iterable[bytes], encoding: str, attr: str,
+               pattern: Optional[Pattern] = None, tag: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+    """
+    The values of attr (e.g. "href") on tag, or on any element when tag is None,
+    that pattern.search() matches, in document order. Stops reading at limit.
+    """
+    extractor = _LinkExtractor(attr, pattern, tag, limit)
+    extractor.run(chunks, encoding)
+    return extractor.links
+
+def find_text(chunks: Iterable[bytes], encoding: str, tag: str, css_class: str) -> Optional[str]:
+    """ The text content of the first tag element having css_class, or None if there's no such element """
+    extractor = _TextExtractor(tag, css_class)
+    extractor.run(chunks, encoding)
+
+    if extractor.depth == 0 and not extractor.done:
+        return None
+    return "".join(extractor.parts)
@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+
+import hashlib
+import json
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+from gi.repository import GLib
+
+from misc import atomic_write, temporary_path
+
+ICON_CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "icons")
+
+# Entries younger than this are used without asking the server.
+MAX_AGE = 7 * (60 * 60 * 24) # days
+# housekeeping trims the least recently used entries beyond this.
+MAX_CACHE_SIZE = 50 * 1024 * 1024
+# Anything bigger isn't an icon, don't let it push the icons out.
+MAX_ENTRY_SIZE = 2 * 1024 * 1024
+
+META_SUFFIX = ".json"
+
+class Entry:
+    """
+    A cached download: the file itself plus the validators the server sent
+    with it. The data file's mtime records when it was last used.
+    """
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.meta.get("fetched", 0) < MAX_AGE
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+def _path_for_url(url: str) -> str:
+    return os.path.join(ICON_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest())
+
+def _write_meta(path: str, meta: dict) -> None:
+    with atomic_write(path + META_SUFFIX) as f:
+        json.dump(meta, f)
+
+def lookup(url: str) -> Optional[Entry]:
+    path = _path_for_url(url)
+    try:
+        with open(path + META_SUFFIX, "r") as f:
+            meta = json.load(f)
+        if meta.get("url") != url or not os.path.exists(path):
+            return None
+    except (OSError, ValueError):
+        return None
+
+    return Entry(path, meta)
+
+def mark_used(entry: Entry) -> None:
+    try:
+        os.utime(entry.path)
+    except OSError:
+        pass
+
+def mark_revalidated(entry: Entry) -> None:
+    """ The server answered 304 - the entry is good for another MAX_AGE """
+    entry.meta["fetched"] = time.time()
+    try:
+        _write_meta(entry.path, entry.meta)
+    except OSError as e:
+        print("MintInstall: Could not update icon cache entry for %s: %s" % (entry.meta["url"], e))
+    mark_used(entry)
+
+class Writer:
+    """
+    Writes a download into the cache as it streams in, along with the
+    ETag/Last-Modified response headers. Nothing replaces the existing entry
+    unless commit() is reached; downloads over MAX_ENTRY_SIZE are dropped.
+    """
+    def __init__(self, url: str, headers):
+        self.url = url
+        self.path = _path_for_url(url)
+        self.meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched": time.time()
+        }
+        self.size = 0
+        # Written over several calls, so not through misc.replacing(); abort() cleans up.
+        self.tmp_path = temporary_path(self.path)
+        self._file = None
+
+        try:
+            os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+            self._file = open(self.tmp_path, "wb")
+        except OSError as e:
+            print("MintInstall: Could not cache %s: %s" % (url, e))
+
+    def write(self, data: bytes) -> None:
+        if self._file is None:
+            return
+
+        self.size += len(data)
+        if self.size > MAX_ENTRY_SIZE:
+            self.abort()
+            return
+
+        try:
+            self._file.write(data)
+        except OSError as e:
+            print("MintInstall: Could not cache %s: %s" % (self.url, e))
+            self.abort()
+
+    def commit(self) -> None:
+        if self._file is None:
+            return
+
+        try:
+            self._file.close()
+            self._file = None
+            # Without metadata the entry is a miss, never new data with old validators.
+            _unlink(self.path + META_SUFFIX)
+            os.replace(self.tmp_path, self.path)
+            _write_meta(self.path, self.meta)
+        except OSError as e:
+            print("MintInstall: Could not cache %s: %s" % (self.url, e))
+            self.abort()
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        _unlink(self.tmp_path)
+
+def trim(stop_event: Optional[threading.Event] = None, max_size: int = MAX_CACHE_SIZE) -> None:
+    """ Deletes the least recently used entries until the cache fits in max_size """
+    try:
+        names = os.listdir(ICON_CACHE_DIR)
+    except OSError:
+        return
+
+    entries = []
+    total = 0
+    for name in names:
+        if name.endswith(META_SUFFIX):
+            continue
+
+        path = os.path.join(ICON_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+
+        # Leftovers from an interrupted write.
+        if name.endswith(".tmp"):
+            if time.time() - st.st_mtime > 60 * 60:
+                _unlink(path)
+            continue
+
+        size = st.st_size + 512 # roughly the metadata file
+        entries.append((st.st_mtime, size, path))
+        total += size
+
+    entries.sort()
+    for mtime, size, path in entries:
+        if total <= max_size:
+            break
+        if stop_event is not None and stop_event.is_set():
+            return
+
+        _unlink(path + META_SUFFIX)
+        _unlink(path)
+        total -= size
+
+    # Metadata without data (data removed by hand or a failed write).
+    for name in names:
+        if name.endswith(META_SUFFIX) and not os.path.exists(os.path.join(ICON_CACHE_DIR, name[:-len(META_SUFFIX)])):
+            _unlink(os.path.join(ICON_CACHE_DIR, name))
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
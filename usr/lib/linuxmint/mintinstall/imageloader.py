@@ -0,0 +1,270 @@
+#!/usr/bin/python3
+
+import heapq
+import itertools
+import threading
+import traceback
+import requests
+import network
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from gi.repository import GLib, Gio, GdkPixbuf
+
+import iconcache
+
+# Lower values are served first.
+PRIORITY_VISIBLE = 0    # tiles and images the user is looking at
+PRIORITY_DETAILS = 1    # the details page (icon, screenshots)
+
+NUM_WORKERS = 4
+CHUNK_SIZE = 64 * 1024
+
+# Decoded images kept around for reuse (see SurfaceCache), in bytes.
+SURFACE_CACHE_BUDGET = 32 * 1024 * 1024
+
+# callback(pixbuf, error) - the decoded image, or None with an error message.
+FetchCallback = Callable[[Optional[GdkPixbuf.Pixbuf], Optional[str]], None]
+
+class FetchCancelled(Exception):
+    pass
+
+def fit_size(width: int, height: int, max_width: int, max_height: int) -> Tuple[int, int]:
+    """ The size gdk-pixbuf's *_at_scale() functions pick when preserving the aspect ratio; -1 leaves a side free """
+    if max_width < 0 and max_height < 0:
+        return width, height
+    if max_width < 0:
+        return max(1, int(0.5 + width * max_height / height)), max_height
+    if max_height < 0:
+        return max_width, max(1, int(0.5 + height * max_width / width))
+    if height * max_width > width * max_height:
+        return max(1, int(0.5 + width * max_height / height)), max_height
+    return max_width, max(1, int(0.5 + height * max_width / width))
+
+class _Job:
+    __slots__ = ("source", "width", "height", "priority", "waiters", "started", "abandoned")
+
+    def __init__(self, source: str, width: int, height: int, priority: int):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.priority = priority
+        self.waiters: List[Tuple[Gio.Cancellable, FetchCallback]] = []
+        self.started = False
+        self.abandoned = False
+
+    @property
+    def key(self) -> Tuple[str, int, int]:
+        return self.source, self.width, self.height
+
+    def all_cancelled(self) -> bool:
+        return all(cancellable.is_cancelled() for cancellable, callback in self.waiters)
+
+class ImageLoader:
+    """
+    Loads images (http(s) URLs or local paths) on a small, fixed set of
+    worker threads, decoding them at the requested size as the data arrives.
+
+    Requests for a source and size that is already queued or being loaded
+    join that load instead of starting another one. Each requester passes its own
+    Gio.Cancellable; a fetch is dropped (or aborted between chunks) once every
+    requester waiting on it has cancelled. Callbacks run on the main loop.
+
+    Remote files go through iconcache: fresh entries are used without touching
+    the network, stale ones are revalidated, and a stale copy beats an error.
+    """
+    def __init__(self, num_workers: int = NUM_WORKERS):
+        self._num_workers = num_workers
+        self._workers: List[threading.Thread] = []
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int, _Job]] = []
+        self._jobs = {}
+        self._counter = itertools.count()
+
+    def fetch(self, source: str, width: int, height: int, priority: int,
+              cancellable: Gio.Cancellable, callback: FetchCallback) -> None:
+        """ Loads source scaled to fit width x height (-1 for either keeps the natural size) """
+        key = (source, int(width), int(height))
+
+        with self._cond:
+            job = self._jobs.get(key)
+
+            if job is None or job.abandoned:
+                job = _Job(source, int(width), int(height), priority)
+                self._jobs[key] = job
+                heapq.heappush(self._queue, (priority, next(self._counter), job))
+            elif priority < job.priority and not job.started:
+                # Queue it again at the better priority, the old entry gets skipped.
+                job.priority = priority
+                heapq.heappush(self._queue, (priority, next(self._counter), job))
+
+            job.waiters.append((cancellable, callback))
+
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            if len(self._workers) < self._num_workers:
+                worker = threading.Thread(target=self._worker_thread, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+            self._cond.notify()
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while True:
+                while not self._queue:
+                    self._cond.wait()
+
+                priority, order, job = heapq.heappop(self._queue)
+                if job.started:
+                    continue
+
+                if job.all_cancelled():
+                    # Also makes any other heap entry for it (after a priority raise) get skipped.
+                    job.started = True
+                    job.abandoned = True
+                    self._forget(job)
+                    continue
+
+                job.started = True
+                return job
+
+    def _check_wanted(self, job: _Job) -> None:
+        with self._cond:
+            if job.all_cancelled():
+                job.abandoned = True
+                self._forget(job)
+                raise FetchCancelled()
+
+    def _forget(self, job: _Job) -> None:
+        # A newer job may have taken over the key since (see fetch), leave that one alone.
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+
+    def _worker_thread(self) -> None:
+        while True:
+            try:
+                self._run_job(self._next_job())
+            except Exception:
+                # Keep the worker alive, the pool never shrinks on its own.
+                traceback.print_exc()
+
+    def _run_job(self, job: _Job) -> None:
+        pixbuf = None
+        error = None
+        try:
+            pixbuf = self._load(job)
+        except FetchCancelled:
+            return
+        except Exception as e:
+            error = str(e)
+
+        with self._cond:
+            self._forget(job)
+            waiters = job.waiters
+
+        for cancellable, callback in waiters:
+            if not cancellable.is_cancelled():
+                GLib.idle_add(callback, pixbuf, error)
+
+    def _load(self, job: _Job) -> GdkPixbuf.Pixbuf:
+        if job.source.startswith("http"):
+            return self._load_remote(job)
+
+        self._check_wanted(job)
+        return self._load_file(job, job.source)
+
+    def _load_file(self, job: _Job, path: str) -> GdkPixbuf.Pixbuf:
+        # gdk-pixbuf reads and scales the file itself, no copy of it passes through Python.
+        return GdkPixbuf.Pixbuf.new_from_file_at_scale(path, job.width, job.height, True)
+
+    def _load_remote(self, job: _Job) -> GdkPixbuf.Pixbuf:
+        entry = iconcache.lookup(job.source)
+        if entry is not None and entry.is_fresh():
+            iconcache.mark_used(entry)
+            network.record_cache_hit(job.source)
+            return self._load_file(job, entry.path)
+
+        headers = entry.validators() if entry is not None else {}
+
+        try:
+            with network.stream(job.source, headers=headers) as r:
+                if r.status_code == 304 and entry is not None:
+                    iconcache.mark_revalidated(entry)
+                    return self._load_file(job, entry.path)
+
+                r.raise_for_status()
+                return self._decode_stream(job, r)
+        except requests.RequestException:
+            if entry is None:
+                raise
+            return self._load_file(job, entry.path)
+
+    def _decode_stream(self, job: _Job, response: requests.Response) -> GdkPixbuf.Pixbuf:
+        """ Feeds the body to the decoder as it arrives, saving it to the icon cache on the way """
+        loader = GdkPixbuf.PixbufLoader()
+        loader.connect("size-prepared", self._on_size_prepared, job)
+        writer = iconcache.Writer(job.source, response.headers)
+
+        try:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                self._check_wanted(job)
+                loader.write(chunk)
+                writer.write(chunk)
+            loader.close()
+        except Exception:
+            writer.abort()
+            try:
+                loader.close()
+            except GLib.Error:
+                pass
+            raise
+
+        writer.commit()
+        return loader.get_pixbuf()
+
+    def _on_size_prepared(self, loader: GdkPixbuf.PixbufLoader, width: int, height: int, job: _Job) -> None:
+        # Decode straight to the displayed size rather than scaling a full-size copy afterwards.
+        scaled_width, scaled_height = fit_size(width, height, job.width, job.height)
+        if (scaled_width, scaled_height) != (width, height):
+            loader.set_size(scaled_width, scaled_height)
+
+class SurfaceCache:
+    """
+    Least-recently-used cache of decoded cairo surfaces, bounded by their
+    pixel memory. Keys are (source, width, height, scale factor) so the same
+    file requested at another size is decoded separately.
+
+    Surfaces are only created and drawn on the main thread, so is this cache.
+    """
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def lookup(self, key: Tuple) -> Optional[Tuple[Any, float, float]]:
+        """ Returns (surface, width, height) or None; width and height are in logical pixels """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[:3]
+
+    def add(self, key: Tuple, surface: Any, width: float, height: float, nbytes: int) -> None:
+        # A single huge image would flush everything else.
+        if nbytes > self.budget // 4:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[3]
+
+        self._entries[key] = (surface, width, height, nbytes)
+        self.size += nbytes
+
+        while self.size > self.budget:
+            key, entry = self._entries.popitem(last=False)
+            self.size -= entry[3]
+
+default_loader = ImageLoader()
+default_surfaces = SurfaceCache(SURFACE_CACHE_BUDGET)
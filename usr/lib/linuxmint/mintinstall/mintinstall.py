@@ -7,23 +7,21 @@ import os
 import gettext
 import threading
 import locale
-import urllib.request, urllib.parse, urllib.error
 import random
 from datetime import datetime
 import subprocess
 import platform
 import functools
-import requests
 import time
 import json
 import re
 import math
-from pathlib import Path
 import tempfile
 import base64
 import types
 import traceback
 from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
 
 import gi
 gi.require_version('Gtk', '3.0')
@@ -37,7 +35,13 @@ from mintcommon.installer import dialogs
 import prefs
 import reviews
 import housekeeping
-from misc import print_timing, networking_available
+import imageloader
+import network
+import screenshotcache
+import htmlextract
+import descriptioncache
+from misc import print_timing, networking_available, debug, replacing
+from screenshotcache import SCREENSHOT_DIR, SCREENSHOT_THUMBNAIL_DIR, thumbnail_path
 from screenshot_window import ScreenshotWindow
 
 ADDON_ICON_SIZE = 24
@@ -47,6 +51,35 @@ DETAILS_ICON_SIZE = 64
 SCREENSHOT_HEIGHT = 351
 SCREENSHOT_WIDTH = 624
 
+# The details page shows this many screenshots at most.
+MAX_SCREENSHOTS = 4
+# Seconds ScreenshotDownloader waits for sources and images, all of them together.
+SCREENSHOT_DEADLINE = 10
+SCREENSHOT_WORKERS = 6
+SCREENSHOT_CHUNK_SIZE = 64 * 1024
+
+# Where screenshots come from, as recorded in screenshotcache.
+SCREENSHOT_SOURCE_APPSTREAM = "appstream"
+SCREENSHOT_SOURCE_COMMUNITY = "community"
+SCREENSHOT_SOURCE_DEBIAN = "debian"
+SCREENSHOT_SOURCE_HAMONIKR = "hamonikr"
+
+DEBIAN_SCREENSHOT_RE = re.compile(r"/shrine/screenshot[/\d\w]*large-[\w\d]*.png")
+HAMONIKR_IMAGE_RE = re.compile(r"^https://hamonikr\.org")
+HAMONIKR_DESCRIPTION_SOURCE = "hamonikr"
+
+# When a list is shown, screenshots for its first few packages are downloaded
+# ahead of time, one package at a time and within these limits.
+PREFETCH_SCREENSHOT_PACKAGES = 8
+PREFETCH_WORKERS = 2
+PREFETCH_BYTE_BUDGET = 16 * 1024 * 1024
+PREFETCH_TIME_BUDGET = 60
+
+# Application list tiles load their icon once within this many pages of the
+# visible area, and drop a load that hasn't finished beyond the second margin.
+LAZY_ICON_LOAD_MARGIN = 1
+LAZY_ICON_CANCEL_MARGIN = 3
+
 from math import pi
 DEGREES = pi / 180
 
@@ -85,8 +118,6 @@ _ = gettext.gettext
 import setproctitle
 setproctitle.setproctitle("mintinstall")
 
-SCREENSHOT_DIR = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "screenshots")
-
 Gtk.IconTheme.get_default().append_search_path("/usr/share/linuxmint/mintinstall")
 
 # List of aliases
@@ -177,14 +208,16 @@ class AsyncImage(Gtk.Image):
         'image-failed': (GObject.SignalFlags.RUN_LAST, None, ())
     }
 
-    def __init__(self, icon_string=None, width=DETAILS_ICON_SIZE, height=DETAILS_ICON_SIZE):
+    def __init__(self, icon_string=None, width=DETAILS_ICON_SIZE, height=DETAILS_ICON_SIZE, priority=imageloader.PRIORITY_VISIBLE):
         super(AsyncImage, self).__init__()
 
         self.path = None
+        self.surface_key = None
         self.cancellable = None
         self.loader = None
         self.width = 1
         self.height = 1
+        self.priority = priority
 
         self.connect("destroy", self.on_destroyed)
 
@@ -214,15 +247,27 @@ class AsyncImage(Gtk.Image):
         else:
             self.height = height
 
+        if self.cancellable:
+            self.cancellable.cancel()
         self.cancellable = None
-        file = None
 
-        if os.path.isabs(icon_string):
+        if os.path.isabs(icon_string) or icon_string.startswith("http"):
             self.path = icon_string
-            file = Gio.File.new_for_path(self.path)
-        elif icon_string.startswith("http"):
-            self.path = icon_string
-            file = Gio.File.new_for_uri(self.path)
+            self.cancellable = Gio.Cancellable()
+            self.surface_key = (self.path, self.width, self.height, self.get_scale_factor())
+
+            cached = imageloader.default_surfaces.lookup(self.surface_key)
+            if cached is not None:
+                surface, self.width, self.height = cached
+                self.set_from_surface(surface)
+                self.set_size_request(self.width, self.height)
+                # Callers connect to our signals after constructing us.
+                GLib.idle_add(self.emit_cached_image_loaded, self.cancellable)
+                return
+
+            # Bound to this request: by the time the image arrives we may be showing another one.
+            imageloader.default_loader.fetch(self.path, self.width, self.height, self.priority, self.cancellable,
+                                             functools.partial(self.on_pixbuf_loaded, self.cancellable, self.surface_key))
         elif theme.has_icon(icon_string):
             self.width = width
             self.height = height
@@ -230,57 +275,13 @@ class AsyncImage(Gtk.Image):
             self.set_from_icon_name(icon_string, Gtk.IconSize.DIALOG)
             self.set_pixel_size(self.height)
             self.emit("image-loaded")
-            return
-
-        if file:
-            self.cancellable = Gio.Cancellable()
-            t = threading.Thread(target=self._fetch_url_thread, args=[file])
-            t.start()
         else:
             self.set_icon_string(FALLBACK_PACKAGE_ICON_PATH, self.original_width, self.original_height)
 
-    def _fetch_url_thread(self, file):
-        data = None
-
-        if file.get_uri().startswith("http"):
-            try:
-                r = requests.get(file.get_uri(), stream=True, timeout=10)
-
-                if self.cancellable.is_cancelled():
-                    return
-
-                bdata = b''
-                for chunk in r.iter_content(chunk_size=1024):
-                    if chunk:
-                        bdata += chunk
-
-                data = bdata
-            except Exception as e:
-                GLib.idle_add(self.emit_image_failed, str(e))
-                return
-        else:
-            try:
-                success, contents, etag = file.load_contents(self.cancellable)
-                data =  bytes(contents)
-            except GLib.Error as e:
-                if e.code != Gio.IOErrorEnum.CANCELLED:
-                    GLib.idle_add(self.emit_image_failed, e.message)
-                return
-
-        stream = Gio.MemoryInputStream.new_from_data(data, None)
-
-        if self.cancellable.is_cancelled():
-            return
-
-        if stream:
-            GdkPixbuf.Pixbuf.new_from_stream_at_scale_async(stream,
-                                                            self.width,
-                                                            self.height,
-                                                            True,
-                                                            self.cancellable,
-                                                            self.on_pixbuf_created)
-        else:
-            GLib.idle_add(self.emit_image_failed)
+    def emit_cached_image_loaded(self, cancellable):
+        if not cancellable.is_cancelled():
+            self.emit("image-loaded")
+        return False
 
     def emit_image_failed(self, message=None):
         print("AsyncIcon could not read icon file contents for loading (%s): %s" % (self.path, message))
@@ -289,27 +290,24 @@ class AsyncImage(Gtk.Image):
         self.set_icon_string(FALLBACK_PACKAGE_ICON_PATH, self.original_width, self.original_height)
         self.emit("image-failed")
 
-    def on_pixbuf_created(self, stream, result, data=None):
-        if self.cancellable.is_cancelled():
-            stream.close()
+    def on_pixbuf_loaded(self, cancellable, surface_key, pixbuf, error):
+        # Runs on the main loop once the shared loader has decoded the image.
+        if cancellable.is_cancelled() or cancellable is not self.cancellable:
             return
 
-        try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_stream_finish(result)
-
-            if pixbuf:
-                scale = self.get_scale_factor()
-                self.width = pixbuf.get_width() / scale
-                self.height = pixbuf.get_height() / scale
-                surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf,
-                                                               scale,
-                                                               self.get_window())
-                self.set_from_surface(surface)
-        except GLib.Error as e:
-            self.emit_image_failed(e.message)
+        if pixbuf is None:
+            self.emit_image_failed(error)
             return
 
-        stream.close()
+        scale = self.get_scale_factor()
+        self.width = pixbuf.get_width() / scale
+        self.height = pixbuf.get_height() / scale
+        surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf,
+                                                       scale,
+                                                       self.get_window())
+        self.set_from_surface(surface)
+        imageloader.default_surfaces.add(surface_key, surface, self.width, self.height,
+                                         pixbuf.get_width() * pixbuf.get_height() * 4)
 
         # size request is whatever sizes we inputted, but those sizes are 'max' in either direction - the
         # final image may be different because of aspect ratios. We re-assigned self.width/height when we
@@ -317,13 +315,73 @@ class AsyncImage(Gtk.Image):
         self.set_size_request(self.width, self.height)
         self.emit("image-loaded")
 
+def make_screenshot_thumbnail(path, scale):
+    try:
+        os.makedirs(SCREENSHOT_THUMBNAIL_DIR, exist_ok=True)
+        # Same size AsyncImage asks for on the details page, so it's loaded without any scaling.
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, SCREENSHOT_WIDTH * scale, SCREENSHOT_HEIGHT * scale, True)
+        with replacing(thumbnail_path(path, scale)) as tmp_path:
+            pixbuf.savev(tmp_path, "png", [], [])
+    except (GLib.Error, OSError) as e:
+        print("MintInstall: Could not create screenshot thumbnail for %s: %s" % (path, e))
+
+class DownloadCancelled(Exception):
+    pass
+
 class ScreenshotDownloader(threading.Thread):
-    def __init__(self, application, pkginfo, scale):
+    """
+    Finds and downloads a package's screenshots. Every source, and every image
+    a source turns up, is fetched at the same time on a small thread pool.
+    Screenshots are still numbered and shown in source order (see
+    get_enabled_sources), then in the order each source lists them: an image
+    that arrives early waits for the ones ahead of it. Whatever is still
+    outstanding once MAX_SCREENSHOTS are in place or SCREENSHOT_DEADLINE has
+    passed is dropped.
+
+    How each source answered is recorded in screenshotcache, and sources that
+    recently had nothing or failed are left out (see self.sources). The
+    screenshots are only added to it once the download is over, and not at
+    all when it was cancelled: a partial set would otherwise be shown from
+    then on instead of being downloaded again.
+    """
+    def __init__(self, application, pkginfo, scale, workers=SCREENSHOT_WORKERS):
         threading.Thread.__init__(self)
         self.application = application
         self.pkginfo = pkginfo
         self.settings = Gio.Settings(schema_id="com.linuxmint.install")
         self.scale_factor = scale
+        self.workers = workers
+
+        self.executor = None
+        self.stop_event = threading.Event()
+        self.cond = threading.Condition()
+        self.cancelled = False
+        self.adopted = False
+        self.outstanding = 0
+        self.num_screenshots = 0
+        self.files = []
+        self.bytes_received = 0
+
+        self.sources = screenshotcache.sources_to_try(pkginfo.name, self.get_enabled_sources())
+        self.source_tasks = {source: 0 for source in self.sources}
+        self.sources_found = set()
+        self.sources_not_found = set()
+        self.sources_failed = set()
+
+        # The images each source listed, None while it's still being asked.
+        self.images = {source: None for source in self.sources}
+        # (source, index) -> (tmp_path, source_url) once downloaded, or None when that failed.
+        self.results = {}
+        self.placed = set()
+
+    def get_enabled_sources(self):
+        if self.pkginfo.pkg_hash.startswith("f"):
+            return [SCREENSHOT_SOURCE_APPSTREAM]
+
+        sources = [SCREENSHOT_SOURCE_COMMUNITY, SCREENSHOT_SOURCE_DEBIAN]
+        if self.settings.get_boolean(prefs.HAMONIKR_SCREENSHOTS):
+            sources.append(SCREENSHOT_SOURCE_HAMONIKR)
+        return sources
 
     def prefix_media_base_url(self, url):
         if (not url.startswith("http")) and self.pkginfo.remote == "flathub":
@@ -331,124 +389,337 @@ class ScreenshotDownloader(threading.Thread):
         return url
 
     def run(self):
-        num_screenshots = 0
-        self.application.screenshots = []
-        # Add main screenshot
+        try:
+            self.download_screenshots()
+        finally:
+            self.application.release_screenshot_download(self)
+
+    def cancel(self):
+        with self.cond:
+            # The details page is showing what we download, see adopt().
+            if self.adopted:
+                return
+            self.cancelled = True
+            self.stop_event.set()
+            self.cond.notify_all()
 
-        if self.pkginfo.pkg_hash.startswith("f"):
-            try:
-                # Add additional screenshots from AppStream
-                if len(self.application.installer.get_screenshots(self.pkginfo)) > 0:
-                    for screenshot in self.pkginfo.screenshots:
-            
-                        # compatibility with libappstream < 1.0.0
-                        try:
-                            image = screenshot.get_image(624, 351, self.scale_factor)
-                        except TypeError:
-                            image = screenshot.get_image(624, 351)
+    def adopt(self):
+        """
+        For the details page of a package whose screenshots are already being
+        downloaded (by a prefetch): returns (num, path, source_url) of the ones
+        in place so far, the rest arrive through add_screenshot() as usual.
+        From then on cancel() is ignored. Returns None when it's too late for
+        that, the download was cancelled.
+        """
+        with self.cond:
+            if self.cancelled:
+                return None
+            self.adopted = True
+            return [(num, local_name, source_url) for num, local_name, source_url, size in self.files]
+
+    def download_screenshots(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="screenshots")
+
+        finders = {
+            SCREENSHOT_SOURCE_APPSTREAM: self.find_appstream_screenshots,
+            SCREENSHOT_SOURCE_DEBIAN: self.find_debian_screenshots,
+            SCREENSHOT_SOURCE_HAMONIKR: self.find_hamonikr_screenshots
+        }
+
+        for source in self.sources:
+            if source == SCREENSHOT_SOURCE_COMMUNITY:
+                self.add_images(source, [("https://community.linuxmint.com/img/screenshots/%s.png" % self.pkginfo.name, None)])
+            else:
+                self.submit(source, self.find, finders[source])
+
+        with self.cond:
+            self.cond.wait_for(lambda: self.outstanding == 0 or self.num_screenshots >= MAX_SCREENSHOTS \
+                                       or self.stop_event.is_set(),
+                               timeout=SCREENSHOT_DEADLINE)
+            cancelled = self.cancelled
+            if not cancelled:
+                # Out of time: whatever has arrived moves up into the places of what hasn't.
+                self.place_screenshots(final=True)
+            self.stop_event.set()
+            num_screenshots = self.num_screenshots
+            files = list(self.files)
+
+            # Arrived, but too late or beyond MAX_SCREENSHOTS.
+            leftovers = [result[0] for key, result in self.results.items() if result is not None and key not in self.placed]
+            self.placed.update(self.results.keys())
+
+            # Only sources that got to the end have an answer.
+            finished = [source for source, tasks in self.source_tasks.items() if tasks == 0]
+            found = self.sources_found.intersection(finished)
+            failed = self.sources_failed.intersection(finished) - found
+            not_found = self.sources_not_found.intersection(finished) - found - failed
+
+        # Downloads still running notice stop_event and throw away what they have.
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+        for tmp_path in leftovers:
+            self.discard(tmp_path)
+
+        # Files left out are deleted by housekeeping.
+        if not cancelled:
+            for num, local_name, source_url, size in files:
+                screenshotcache.add_file(self.pkginfo.name, num, local_name, source_url, size)
+
+        # Also writes out the files added above.
+        if found or failed or not_found or files:
+            screenshotcache.record_results(self.pkginfo.name, found, not_found, failed)
+
+        if num_screenshots == 0 and not cancelled:
+            self.add_screenshot(self.pkginfo, None, 0)
 
-                        url = self.prefix_media_base_url(image.get_url())
-                        if requests.head(url, timeout=5).status_code < 400:
-                            num_screenshots += 1
+    def submit(self, source, func, *args):
+        with self.cond:
+            if self.stop_event.is_set():
+                return
+            self.outstanding += 1
+            self.source_tasks[source] += 1
+            self.executor.submit(self.run_task, source, func, *args)
 
-                            local_name = os.path.join(SCREENSHOT_DIR, "%s_%s.png" % (self.pkginfo.name, num_screenshots))
+    def run_task(self, source, func, *args):
+        try:
+            func(source, *args)
+        except Exception as e:
+            with self.cond:
+                if network.is_not_found(e):
+                    self.sources_not_found.add(source)
+                else:
+                    self.sources_failed.add(source)
+            # Most packages are missing from most sources, that's no news.
+            debug("Screenshot lookup for %s failed: %s" % (self.pkginfo.name, e))
+        finally:
+            with self.cond:
+                self.outstanding -= 1
+                self.source_tasks[source] -= 1
+                self.cond.notify_all()
+
+    def find(self, source, finder):
+        images = []
+        try:
+            images = finder()
+        finally:
+            # Even when the lookup failed: the sources after this one needn't wait for it.
+            self.add_images(source, images)
 
-                            images = screenshot.get_images_all()
-                            for i in images:
-                                if i.get_kind() == AppStream.ImageKind.SOURCE:
-                                    source = i
+    def add_images(self, source, images):
+        images = images[:MAX_SCREENSHOTS]
 
-                                    source_url = self.prefix_media_base_url(source.get_url())
-                                    self.save_to_file(url, source_url, local_name)
+        with self.cond:
+            self.images[source] = images
+            if len(images) == 0:
+                self.sources_not_found.add(source)
+            self.place_screenshots()
 
-                            self.add_screenshot(self.pkginfo, local_name, num_screenshots)
-            except Exception as e:
-                print(e)
+        for index, (url, source_url) in enumerate(images):
+            self.submit(source, self.download, index, url, source_url)
 
-            if num_screenshots == 0:
-                self.add_screenshot(self.pkginfo, None, 0)
+    def place_screenshots(self, final=False):
+        """
+        Numbers and shows the downloaded screenshots that are next in line,
+        stopping at the first image (or source) not answered yet. With final,
+        those are skipped instead. Called with self.cond held.
+        """
+        for source in self.sources:
+            images = self.images[source]
+            if images is None:
+                if final:
+                    continue
+                return
 
-            return
-        try:
-            link = "https://community.linuxmint.com/img/screenshots/%s.png" % self.pkginfo.name
-            if requests.head(link, timeout=5).status_code < 400:
-                num_screenshots += 1
+            for index in range(len(images)):
+                key = (source, index)
+                if key in self.placed:
+                    continue
+                if self.num_screenshots >= MAX_SCREENSHOTS or self.stop_event.is_set():
+                    return
+                if key not in self.results:
+                    if final:
+                        continue
+                    return
 
-                local_name = os.path.join(SCREENSHOT_DIR, "%s_%s.png" % (self.pkginfo.name, num_screenshots))
-                self.save_to_file(link, None, local_name)
+                self.placed.add(key)
+                result = self.results[key]
+                if result is not None:
+                    self.place_screenshot(*result)
 
-                self.add_screenshot(self.pkginfo, local_name, num_screenshots)
-        except Exception as e:
-            print(e)
+    def place_screenshot(self, tmp_path, source_url):
+        num = self.num_screenshots + 1
+        local_name = os.path.join(SCREENSHOT_DIR, "%s_%s.png" % (self.pkginfo.name, num))
 
         try:
-            # Add additional screenshots from Debian
-            from bs4 import BeautifulSoup
-            page = BeautifulSoup(urllib.request.urlopen("https://screenshots.debian.net/package/%s" % self.pkginfo.name, timeout=5), "lxml")
-            images = page.findAll(href=re.compile(r"/shrine/screenshot[/\d\w]*large-[\w\d]*.png"))
-            for image in images:
-                if num_screenshots >= 4:
-                    break
+            os.replace(tmp_path, local_name)
+            size = os.path.getsize(local_name)
+        except OSError as e:
+            print("MintInstall: Could not save screenshot %s: %s" % (local_name, e))
+            self.discard(tmp_path)
+            return
 
-                num_screenshots += 1
+        # Made while the file was still downloading, see download().
+        try:
+            os.replace(thumbnail_path(tmp_path, self.scale_factor),
+                       thumbnail_path(local_name, self.scale_factor))
+        except OSError:
+            pass
 
-                thumb = "https://screenshots.debian.net%s" % image['href']
-                local_name = os.path.join(SCREENSHOT_DIR, "%s_%s.png" % (self.pkginfo.name, num_screenshots))
-                self.save_to_file(thumb, None, local_name)
+        self.num_screenshots = num
+        self.files.append((num, local_name, source_url, size))
+        self.add_screenshot(self.pkginfo, local_name, num, source_url)
 
-                self.add_screenshot(self.pkginfo, local_name, num_screenshots)
-        except Exception as e:
-            pass
+    def discard(self, tmp_path):
+        for path in (tmp_path, thumbnail_path(tmp_path, self.scale_factor)):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
 
-        if self.settings.get_boolean(prefs.HAMONIKR_SCREENSHOTS):
+    def find_appstream_screenshots(self):
+        images = []
+        self.application.installer.get_screenshots(self.pkginfo)
+        for screenshot in self.pkginfo.screenshots:
+            # compatibility with libappstream < 1.0.0
             try:
-                # Add additional screenshots from Hamonikr
-                from bs4 import BeautifulSoup
-                hamonikrpkgname = self.pkginfo.name.replace("-","_")
-                page = BeautifulSoup(urllib.request.urlopen("https://hamonikr.org/%s" % hamonikrpkgname, timeout=5), "lxml")
-                images = page.findAll('img')
-                for image in images:
-                    if num_screenshots >= 4:
-                        break
-                    if image['src'].startswith('https://hamonikr.org'):
-                        num_screenshots += 1
+                image = screenshot.get_image(624, 351, self.scale_factor)
+            except TypeError:
+                image = screenshot.get_image(624, 351)
+
+            url = self.prefix_media_base_url(image.get_url())
+            source_url = None
+            for i in screenshot.get_images_all():
+                if i.get_kind() == AppStream.ImageKind.SOURCE:
+                    source_url = self.prefix_media_base_url(i.get_url())
+
+            images.append((url, source_url))
+
+        return images
+
+    def find_debian_screenshots(self):
+        with network.stream("https://screenshots.debian.net/package/%s" % self.pkginfo.name) as r:
+            r.raise_for_status()
+            links = htmlextract.find_links(htmlextract.response_chunks(r), htmlextract.encoding_of(r), "href",
+                                           DEBIAN_SCREENSHOT_RE, limit=MAX_SCREENSHOTS)
+        return [("https://screenshots.debian.net%s" % link, None) for link in links]
+
+    def find_hamonikr_screenshots(self):
+        hamonikrpkgname = self.pkginfo.name.replace("-","_")
+        with network.stream("https://hamonikr.org/%s" % hamonikrpkgname) as r:
+            r.raise_for_status()
+            links = htmlextract.find_links(htmlextract.response_chunks(r), htmlextract.encoding_of(r), "src",
+                                           HAMONIKR_IMAGE_RE, tag="img", limit=MAX_SCREENSHOTS)
+        return [(link, None) for link in links]
+
+    def download(self, source, index, url, source_url):
+        # Not a .png, so nothing looking for screenshots sees it before it's complete.
+        tmp_path = os.path.join(SCREENSHOT_DIR, "%s.%s-%d.%d.tmp" % (self.pkginfo.name, source, index, threading.get_ident()))
+        key = (source, index)
+        received = 0
 
-                        thumb = "%s" % image['src']
-                        link = thumb
+        try:
+            with network.stream(url) as r:
+                r.raise_for_status()
+
+                with open(tmp_path, "wb", buffering=SCREENSHOT_CHUNK_SIZE) as fd:
+                    for chunk in r.iter_content(chunk_size=SCREENSHOT_CHUNK_SIZE):
+                        if self.stop_event.is_set():
+                            raise DownloadCancelled()
+                        fd.write(chunk)
+                        received += len(chunk)
+
+            # Done here rather than once it has its place, which would hold up the screenshots after it.
+            make_screenshot_thumbnail(tmp_path, self.scale_factor)
+
+            with self.cond:
+                self.bytes_received += received
+                received = 0
+                self.sources_found.add(source)
+                if self.stop_event.is_set():
+                    raise DownloadCancelled()
+                self.results[key] = (tmp_path, source_url)
+                self.place_screenshots()
+        except BaseException as e:
+            self.discard(tmp_path)
+            with self.cond:
+                self.bytes_received += received
+                if key not in self.results:
+                    # The screenshots after this one needn't wait for it.
+                    self.results[key] = None
+                    self.place_screenshots()
+            if not isinstance(e, DownloadCancelled):
+                raise
+
+    def add_screenshot(self, pkginfo, name, num, source_url=None):
+        GLib.idle_add(self.add_ss_idle, pkginfo, name, num, source_url)
+
+    def add_ss_idle(self, pkginfo, name, num, source_url):
+        self.application.add_screenshot(pkginfo, name, num, source_url)
+
+class ScreenshotPrefetcher(threading.Thread):
+    """
+    Downloads the screenshots of the first packages in a list before their
+    details are opened. Packages are done one at a time with fewer workers
+    than a details page download, and the whole run stops at
+    PREFETCH_BYTE_BUDGET or PREFETCH_TIME_BUDGET, when cancelled, or while
+    paused for an install task.
+    """
+    def __init__(self, application, pkginfos, scale, paused):
+        threading.Thread.__init__(self, daemon=True)
+        self.application = application
+        self.pkginfos = pkginfos
+        self.scale_factor = scale
 
-                        local_name = os.path.join(SCREENSHOT_DIR, "%s_%s.png" % (self.pkginfo.name, num_screenshots))
-                        self.save_to_file(link, None, local_name)
+        self.stop_event = threading.Event()
+        self.resume_event = threading.Event()
+        self.set_paused(paused)
+        self.downloader = None
 
-                        self.add_screenshot(self.pkginfo, local_name, num_screenshots)
-            except Exception as e:
-                pass
+    def set_paused(self, paused):
+        if paused:
+            self.resume_event.clear()
+        else:
+            self.resume_event.set()
 
-        if num_screenshots == 0:
-            self.add_screenshot(self.pkginfo, None, 0)
+    def cancel(self):
+        self.stop_event.set()
+        self.resume_event.set()
 
-    def save_to_file(self, url, source_url, path):
-        r = requests.get(url, stream=True, timeout=10)
+        downloader = self.downloader
+        if downloader is not None:
+            downloader.cancel()
 
-        with open(path, 'wb') as fd:
-            for chunk in r.iter_content(chunk_size=128):
-                fd.write(chunk)
+    def run(self):
+        deadline = time.monotonic() + PREFETCH_TIME_BUDGET
+        bytes_received = 0
 
-        if source_url is None:
-            source_url = path
+        for pkginfo in self.pkginfos:
+            self.resume_event.wait()
 
-        file = Gio.File.new_for_path(path)
-        info = Gio.FileInfo.new()
-        info.set_attribute_string("metadata::mintinstall-screenshot-source-url", source_url)
-        try:
-            file.set_attributes_from_info(info, Gio.FileQueryInfoFlags.NONE, None)
-        except GLib.Error as e:
-            logging.warning("Unable to store screenshot source url to metadata '%s': %s" % (source_url, e.message))
+            if self.stop_event.is_set() or time.monotonic() > deadline or bytes_received >= PREFETCH_BYTE_BUDGET:
+                break
+
+            if screenshotcache.get_files(pkginfo.name):
+                continue
 
-    def add_screenshot(self, pkginfo, name, num):
-        GLib.idle_add(self.add_ss_idle, pkginfo, name, num)
+            downloader = ScreenshotDownloader(self.application, pkginfo, self.scale_factor, workers=PREFETCH_WORKERS)
+            if not downloader.sources:
+                continue
+
+            # Somebody else (most likely the details page) is already on it.
+            if not self.application.claim_screenshot_download(downloader):
+                continue
+
+            self.downloader = downloader
+            # cancel() may have run before self.downloader was set.
+            if self.stop_event.is_set():
+                downloader.cancel()
+            downloader.run()
+            self.downloader = None
 
-    def add_ss_idle(self, pkginfo, name, num):
-        self.application.add_screenshot(pkginfo, name, num)
+            bytes_received += downloader.bytes_received
+
+        debug("Screenshot prefetch done, %d bytes" % bytes_received)
 
 class FlatpakAddonRow(Gtk.ListBoxRow):
     def __init__(self, app, parent_pkginfo, addon, name_size_group, button_size_group):
@@ -705,7 +976,7 @@ class BannerTile(Gtk.FlowBoxChild):
         self.box = hbox
 
 class PackageTile(Gtk.FlowBoxChild):
-    def __init__(self, pkginfo, installer, show_package_type=False, review_info=None):
+    def __init__(self, pkginfo, installer, show_package_type=False, review_info=None, lazy_icon=False):
         super(PackageTile, self).__init__()
 
         self.button = Gtk.Button();
@@ -717,6 +988,9 @@ class PackageTile(Gtk.FlowBoxChild):
         self.installer = installer
         self.review_info = review_info
         self.show_package_type = show_package_type
+        self.lazy_icon = lazy_icon
+        self.icon_requested = False
+        self.icon_pending = False
 
         self.pkg_category = ''
         if len(pkginfo.categories) > 0:
@@ -746,14 +1020,11 @@ class PackageTile(Gtk.FlowBoxChild):
         self.repopulate_tile()
 
     def repopulate_tile(self):
-        if self.icon is not None:
-            self.icon.destroy()
-
-        icon_string = self.installer.get_icon(self.pkginfo, FEATURED_ICON_SIZE)
-        if not icon_string:
-            icon_string = FALLBACK_PACKAGE_ICON_PATH
-        self.icon = AsyncImage(icon_string, FEATURED_ICON_SIZE, FEATURED_ICON_SIZE)
-        self.icon_holder.add(self.icon)
+        if self.lazy_icon and not self.icon_requested:
+            # The list calls load_icon() once we're close to being scrolled into view.
+            self.show_icon_placeholder()
+        else:
+            self.load_icon()
 
         display_name = self.installer.get_display_name(self.pkginfo)
         self.package_label.set_label(display_name)
@@ -793,6 +1064,42 @@ class PackageTile(Gtk.FlowBoxChild):
         self.show_all()
         self.refresh_state()
 
+    def load_icon(self):
+        if self.icon is not None:
+            self.icon.destroy()
+
+        icon_string = self.installer.get_icon(self.pkginfo, FEATURED_ICON_SIZE)
+        if not icon_string:
+            icon_string = FALLBACK_PACKAGE_ICON_PATH
+        self.icon = AsyncImage(icon_string, FEATURED_ICON_SIZE, FEATURED_ICON_SIZE)
+        self.icon.connect("image-loaded", self.on_icon_loaded)
+        self.icon_holder.add(self.icon)
+        self.icon.show()
+
+        self.icon_requested = True
+        # Themed icons are set right away, only files and downloads are waited on.
+        self.icon_pending = self.icon.cancellable is not None
+
+    def on_icon_loaded(self, image):
+        self.icon_pending = False
+
+    def cancel_icon(self):
+        # Only drop loads still in flight - a finished icon costs nothing to keep.
+        if self.icon_pending:
+            self.icon_requested = False
+            self.icon_pending = False
+            self.show_icon_placeholder()
+
+    def show_icon_placeholder(self):
+        if self.icon is not None:
+            # Destroying an AsyncImage cancels its load.
+            self.icon.destroy()
+
+        self.icon = Gtk.Image()
+        self.icon.set_size_request(FEATURED_ICON_SIZE, FEATURED_ICON_SIZE)
+        self.icon_holder.add(self.icon)
+        self.icon.show()
+
     def _activate_fb_child(self, widget):
         self.activate()
 
@@ -969,7 +1276,15 @@ class Application(Gtk.Application):
         self.picks_tiles = []
         self.category_tiles = []
 
+        self.screenshot_prefetcher = None
+        self.screenshot_downloads = {}
+        self.screenshot_downloads_lock = threading.Lock()
+        self.description_fetches = set()
+        self.description_fetches_lock = threading.Lock()
+        self.top_rated_ranked = False
+
         self.one_package_idle_timer = 0
+        self.lazy_icons_idle_timer = 0
         self.installer_pulse_timer = 0
         self.search_changed_timer = 0
         self.search_idle_timer = 0
@@ -1159,7 +1474,7 @@ class Application(Gtk.Application):
                     FALLBACK_PACKAGE_ICON_PATH = iconInfo.get_filename()
                     break
 
-        self.detail_view_icon = AsyncImage()
+        self.detail_view_icon = AsyncImage(priority=imageloader.PRIORITY_DETAILS)
         self.detail_view_icon.show()
         self.builder.get_object("application_icon_holder").add(self.detail_view_icon)
 
@@ -1241,6 +1556,10 @@ class Application(Gtk.Application):
         box = self.builder.get_object("box_cat_page")
         box.add(self.flowbox_applications)
 
+        # Tiles also ask for this when they get (re)allocated, see idle_show_one_package().
+        adjustment = self.builder.get_object("scrolledwindow_applications").get_vadjustment()
+        adjustment.connect("value-changed", self.queue_lazy_icons_update)
+
         self.back_button = self.builder.get_object("back_button")
         self.back_button.connect("clicked", self.on_back_button_clicked)
         self.previous_page = self.PAGE_LANDING
@@ -1378,8 +1697,15 @@ class Application(Gtk.Application):
 
             self.apply_aliases()
 
-            self.review_cache = reviews.ReviewCache()
-            self.review_cache.connect("reviews-updated", self.load_landing_apps)
+            package_names = {self.installer.cache[pkg_hash].name for pkg_hash in self.installer.cache.keys()}
+
+            # Refreshing the package list brings us back here, retire the previous cache first.
+            if self.review_cache is not None:
+                self.review_cache.disconnect_by_func(self.on_reviews_updated)
+                self.review_cache.kill()
+
+            self.review_cache = reviews.ReviewCache(package_names)
+            self.review_cache.connect("reviews-updated", self.on_reviews_updated)
             self.load_landing_apps()
             self.load_categories_on_landing()
 
@@ -1580,17 +1906,16 @@ class Application(Gtk.Application):
         for child in self.flowbox_top_rated:
             child.destroy()
 
-        apps = []
+        candidates = {}
         for info in (self.all_category.pkginfos + self.flatpak_category.pkginfos):
             if info.refid == "" or info.refid.startswith("app"):
                 if not info.verified:
                     continue
 
                 if info.name != self.banner_app_name and info.name not in self.featured_app_names:
-                    if self.installer.get_icon(info, FEATURED_ICON_SIZE) is not None:
-                        apps.append(info)
-        apps = self.sort_packages(apps, attrgetter("installed", "score_desc", "name"))
-        apps = apps[0:30]
+                    candidates.setdefault(info.name, []).append(info)
+
+        apps = self.pick_top_rated(candidates, 30)
         random.shuffle(apps)
 
         size_group = Gtk.SizeGroup(mode=Gtk.SizeGroupMode.HORIZONTAL)
@@ -1605,6 +1930,33 @@ class Application(Gtk.Application):
             self.picks_tiles.append(tile)
         box.show_all()
 
+    def pick_top_rated(self, candidates, count):
+        # The review cache keeps its packages ranked by score, so walk that
+        # ranking and stop as soon as enough non-installed apps with an icon
+        # turn up, rather than looking up icons for and sorting every app.
+        # Either way the ranking used the reviews, so later review updates
+        # only refresh the ratings shown (see on_reviews_updated).
+        apps = []
+        self.top_rated_ranked = bool(self.review_cache)
+        if self.review_cache:
+            for name in self.review_cache.ranked_names():
+                for info in candidates.get(name, ()):
+                    if self.installer.pkginfo_is_installed(info):
+                        continue
+                    if self.installer.get_icon(info, FEATURED_ICON_SIZE) is not None:
+                        apps.append(info)
+                if len(apps) >= count:
+                    return apps[0:count]
+
+        # Not enough rated apps (or no reviews yet) - rank everything like before.
+        apps = []
+        for infos in candidates.values():
+            for info in infos:
+                if self.installer.get_icon(info, FEATURED_ICON_SIZE) is not None:
+                    apps.append(info)
+        apps = self.sort_packages(apps, attrgetter("installed", "score_desc", "name"))
+        return apps[0:count]
+
     @print_timing
     def load_featured(self):
         box = self.builder.get_object("box_featured")
@@ -1701,7 +2053,20 @@ class Application(Gtk.Application):
         box.pack_start(flowbox, True, True, 0)
         box.show_all()
 
-    def load_landing_apps(self, rcache=None):
+    def on_reviews_updated(self, review_cache, changed):
+        # The first reviews to arrive decide what's in Top Rated, so rebuild
+        # the landing page then. After that only the ratings shown on existing
+        # tiles can change - update those without recreating anything.
+        if not self.top_rated_ranked:
+            self.load_landing_apps()
+            return
+
+        for tile in (self.picks_tiles + self.category_tiles):
+            if tile.review_info is not None and tile.pkginfo.name in changed:
+                tile.review_info = review_cache[tile.pkginfo.name]
+                tile.fill_rating_widget(tile.review_info)
+
+    def load_landing_apps(self):
         self.picks_tiles = []
         self.load_banner()
         self.load_featured()
@@ -1733,6 +2098,10 @@ class Application(Gtk.Application):
     def update_activity_widgets(self):
         num_tasks = self.installer.get_task_count()
 
+        # Installs get the bandwidth.
+        if self.screenshot_prefetcher is not None:
+            self.screenshot_prefetcher.set_paused(num_tasks > 0)
+
         if num_tasks > 0:
             self.active_tasks_button.show()
 
@@ -1856,21 +2225,84 @@ class Application(Gtk.Application):
         self.show_category(self.installed_category)
 
     def add_screenshots(self, pkginfo):
-        ss_dir = Path(SCREENSHOT_DIR)
+        files = screenshotcache.get_files(pkginfo.name)
+
+        # Removed behind our back? Then fetch them all again rather than show a partial set.
+        if not all(os.path.exists(f["path"]) for f in files):
+            screenshotcache.forget_files(pkginfo.name)
+            files = []
 
         n = 0
-        for ss_path in ss_dir.glob("%s_*.png" % pkginfo.name):
+        for f in files:
             n += 1
-            self.add_screenshot(pkginfo, ss_path, n)
+            self.add_screenshot(pkginfo, f["path"], n, f["source_url"])
 
         if n == 0:
             downloadScreenshots = ScreenshotDownloader(self, pkginfo, self.main_window.get_scale_factor())
-            downloadScreenshots.start()
+            if not downloadScreenshots.sources:
+                # Every source had nothing (or failed) not long ago.
+                self.add_screenshot(pkginfo, None, 0)
+            elif self.claim_screenshot_download(downloadScreenshots):
+                downloadScreenshots.start()
+            else:
+                self.adopt_screenshot_download(pkginfo, downloadScreenshots)
+
+    def adopt_screenshot_download(self, pkginfo, downloader):
+        # A prefetch is already downloading them. What it placed before this page was open never
+        # made it here, and it isn't in screenshotcache until the download is over.
+        with self.screenshot_downloads_lock:
+            running = self.screenshot_downloads.get(pkginfo.name)
+            placed = running.adopt() if running is not None else None
+
+            if running is not None and placed is None:
+                # Cancelled, and still winding down: it won't place anything else, ours takes over.
+                self.screenshot_downloads[pkginfo.name] = downloader
+
+        if running is None:
+            # Finished in the meantime, so it's all in screenshotcache now.
+            self.add_screenshots(pkginfo)
+        elif placed is None:
+            downloader.start()
+        else:
+            # The rest arrives through add_screenshot(), anything placed twice is skipped there.
+            for num, path, source_url in placed:
+                self.add_screenshot(pkginfo, path, num, source_url)
+
+    def claim_screenshot_download(self, downloader):
+        with self.screenshot_downloads_lock:
+            if downloader.pkginfo.name in self.screenshot_downloads:
+                return False
+
+            self.screenshot_downloads[downloader.pkginfo.name] = downloader
+            return True
+
+    def release_screenshot_download(self, downloader):
+        with self.screenshot_downloads_lock:
+            if self.screenshot_downloads.get(downloader.pkginfo.name) is downloader:
+                del self.screenshot_downloads[downloader.pkginfo.name]
+
+    def prefetch_screenshots(self, pkginfos):
+        if self.screenshot_prefetcher is not None:
+            self.screenshot_prefetcher.cancel()
+            self.screenshot_prefetcher = None
 
-    def add_screenshot(self, pkginfo, ss_path, n):
+        if len(pkginfos) == 0:
+            return
+
+        self.screenshot_prefetcher = ScreenshotPrefetcher(self,
+                                                          pkginfos[:PREFETCH_SCREENSHOT_PACKAGES],
+                                                          self.main_window.get_scale_factor(),
+                                                          self.installer.get_task_count() > 0)
+        self.screenshot_prefetcher.start()
+
+    def add_screenshot(self, pkginfo, ss_path, n, source_url=None):
         if pkginfo != self.current_pkginfo:
             return
 
+        # Picked up from the disk while a prefetch was still delivering it.
+        if n > 0 and self.screenshot_stack.get_child_by_name(str(n)) is not None:
+            return
+
         try:
             self.screenshot_stack.get_child_by_name("spinner").destroy()
         except AttributeError:
@@ -1887,7 +2319,19 @@ class Application(Gtk.Application):
             self.screenshot_stack.get_window().set_cursor(None)
             return
 
-        screenshot = AsyncImage(str(ss_path), SCREENSHOT_WIDTH, SCREENSHOT_HEIGHT)
+        scale = self.main_window.get_scale_factor()
+        thumbnail = thumbnail_path(str(ss_path), scale)
+        if os.path.exists(thumbnail):
+            location = thumbnail
+        else:
+            # Downloaded before thumbnails existed, or at another scale factor.
+            location = str(ss_path)
+            threading.Thread(target=make_screenshot_thumbnail, args=(location, scale), daemon=True).start()
+
+        screenshot = AsyncImage(location, SCREENSHOT_WIDTH, SCREENSHOT_HEIGHT, priority=imageloader.PRIORITY_DETAILS)
+        # The enlarged view shows the full size image, or at least the original file.
+        screenshot.original_path = str(ss_path)
+        screenshot.source_url = source_url
 
         self.screenshot_stack.add_named(screenshot, str(n))
         self.screenshot_stack.last = n
@@ -1943,28 +2387,14 @@ class Application(Gtk.Application):
 
         return Gdk.EVENT_PROPAGATE
 
-    def get_screenshot_source_from_metadata(self, screenshot):
-        file = Gio.File.new_for_path(screenshot.path)
-
-        try:
-            info = file.query_info("metadata::mintinstall-screenshot-source-url", Gio.FileQueryInfoFlags.NONE, None)
-            url = info.get_attribute_string("metadata::mintinstall-screenshot-source-url")
-            if url is not None:
-                return url
-        except GLib.Error as e:
-            print("Could not retrieve source metadata for screenshot (%s): %s" % (ss_path, e.message))
-
-        return None
-
     def enlarge_screenshot(self, screenshot):
-        source_url = self.get_screenshot_source_from_metadata(screenshot)
-        if source_url is not None:
-            image_location = source_url
+        if screenshot.source_url is not None:
+            image_location = screenshot.source_url
         else:
-            image_location = screenshot.path
+            image_location = screenshot.original_path
 
         if self.screenshot_window is not None:
-            if self.screenshot_window.has_image(source_url):
+            if self.screenshot_window.has_image(image_location):
                 self.screenshot_window.show_all()
                 self.screenshot_window.present()
                 return
@@ -2008,12 +2438,11 @@ class Application(Gtk.Application):
 
         self.navigate_screenshot(None, direction)
         screenshot = self.screenshot_stack.get_visible_child()
-        source_url = self.get_screenshot_source_from_metadata(screenshot)
 
-        if source_url is not None:
-            image_location = source_url
+        if screenshot.source_url is not None:
+            image_location = screenshot.source_url
         else:
-            image_location = screenshot.path
+            image_location = screenshot.original_path
 
         if self.screenshot_window.has_image(image_location):
             self.screenshot_window.show_image(image_location)
@@ -2169,6 +2598,61 @@ class Application(Gtk.Application):
 
         return 0
 
+    def set_description(self, description):
+        app_description = self.builder.get_object("application_description")
+
+        if description not in (None, ''):
+            app_description.set_label(description)
+            app_description.show()
+        else:
+            app_description.hide()
+
+    def claim_description_fetch(self, pkginfo):
+        # Going back and forth to a package shouldn't fetch its description
+        # again while the first fetch is still running - that one shows it.
+        with self.description_fetches_lock:
+            if pkginfo.name in self.description_fetches:
+                return False
+
+            self.description_fetches.add(pkginfo.name)
+            return True
+
+    def release_description_fetch(self, pkginfo):
+        with self.description_fetches_lock:
+            self.description_fetches.discard(pkginfo.name)
+
+    def hamonikr_description_thread(self, pkginfo):
+        hamonikrpkgname = pkginfo.name.replace("-","_")
+
+        try:
+            try:
+                with network.stream("https://hamonikr.org/%s" % hamonikrpkgname) as r:
+                    r.raise_for_status()
+                    text = htmlextract.find_text(htmlextract.response_chunks(r), htmlextract.encoding_of(r),
+                                                 "div", "xe_content")
+            except Exception as e:
+                if not network.is_not_found(e):
+                    # Keep whatever we had, we'll ask again next time.
+                    debug("Could not fetch the Hamonikr description for %s: %s" % (pkginfo.name, e))
+                    return
+                text = None
+
+            descriptioncache.store(HAMONIKR_DESCRIPTION_SOURCE, pkginfo.name, text)
+        finally:
+            self.release_description_fetch(pkginfo)
+
+        GLib.idle_add(self.show_hamonikr_description, pkginfo, text)
+
+    def show_hamonikr_description(self, pkginfo, text):
+        if pkginfo != self.current_pkginfo:
+            return False
+
+        if text is None:
+            text = self.installer.get_description(pkginfo)
+
+        self.set_description(text)
+        return False
+
     def close_application(self, window, event=None):
         if self.installer.is_busy():
             dialog = Gtk.MessageDialog(self.main_window,
@@ -2181,11 +2665,14 @@ class Application(Gtk.Application):
             if res == Gtk.ResponseType.NO:
                 return True
 
-        # kill -9 won't kill mp subprocesses, we have to do them ourselves.
+        # Let the background workers know we're going away before the hard exit below.
         housekeeping.kill()
-        if self.review_cache:
+        if self.review_cache is not None:
             self.review_cache.kill()
 
+        for host, stats in sorted(network.get_stats().items()):
+            debug("Network usage for %s: %s" % (host, stats))
+
         # Not happy with Python when it comes to closing threads, so here's a radical method to get what we want.
         os.system("kill -9 %s &" % os.getpid())
 
@@ -2375,6 +2862,13 @@ class Application(Gtk.Application):
             except AttributeError:
                 pass
 
+    def main_window_shown(self):
+        gdk_window = self.main_window.get_window()
+        if gdk_window is None or not self.main_window.get_visible():
+            return False
+
+        return not (gdk_window.get_state() & Gdk.WindowState.ICONIFIED)
+
     def finished_loading_packages(self):
         self.finish_loading_visual()
         self.start_slideshow_timer()
@@ -2382,6 +2876,10 @@ class Application(Gtk.Application):
         self.gui_ready = True
         self.update_conditional_widgets()
 
+        # The landing page is up - only now let reviews go to the network.
+        if self.review_cache is not None:
+            self.review_cache.schedule_refresh(self.main_window_shown)
+
         if self.install_on_startup_file is not None:
             self.handle_command_line_install(self.install_on_startup_file)
 
@@ -2606,11 +3104,6 @@ class Application(Gtk.Application):
 
         return string
 
-    def get_application_icon(self, pkginfo, size):
-        icon_string = self.get_application_icon_string(pkginfo, size)
-
-        return AsyncImage(icon_string, size, size)
-
     @print_timing
     def show_search_results(self, terms):
         if not self.gui_ready:
@@ -2790,6 +3283,10 @@ class Application(Gtk.Application):
             GLib.source_remove(self.one_package_idle_timer)
             self.one_package_idle_timer = 0
 
+        # We still hold the old tiles, so their icons wouldn't be destroyed along with them.
+        for tile in self.category_tiles:
+            tile.cancel_icon()
+
         for child in self.flowbox_applications.get_children():
             self.flowbox_applications.remove(child)
 
@@ -2840,6 +3337,8 @@ class Application(Gtk.Application):
         for bad in bad_ones:
             apps.remove(bad)
 
+        self.prefetch_screenshots(apps)
+
         self.one_package_idle_timer = GLib.idle_add(self.idle_show_one_package,
                                                     apps,
                                                     collisions)
@@ -2853,18 +3352,13 @@ class Application(Gtk.Application):
             self.one_package_idle_timer = 0
             return False
 
-        icon = self.get_application_icon(pkginfo, LIST_ICON_SIZE)
-
-        summary = self.installer.get_summary(pkginfo)
-        summary = summary.replace("<", "&lt;")
-        summary = summary.replace("&", "&amp;")
-
         if self.review_cache:
             review_info = self.review_cache[pkginfo.name]
         else:
             review_info = None
 
-        tile = PackageTile(pkginfo, self.installer, show_package_type=True, review_info=review_info)
+        tile = PackageTile(pkginfo, self.installer, show_package_type=True, review_info=review_info, lazy_icon=True)
+        tile.connect("size-allocate", self.queue_lazy_icons_update)
         self.flowbox_applications.insert(tile, -1)
         self.category_tiles.append(tile)
 
@@ -2876,6 +3370,36 @@ class Application(Gtk.Application):
         self.one_package_idle_timer = 0
         return False
 
+    def queue_lazy_icons_update(self, widget, data=None):
+        if self.lazy_icons_idle_timer == 0:
+            # Idle, so that new tiles have been allocated by the time we look at them.
+            self.lazy_icons_idle_timer = GLib.idle_add(self.update_lazy_icons)
+
+    def update_lazy_icons(self):
+        self.lazy_icons_idle_timer = 0
+
+        adj = self.builder.get_object("scrolledwindow_applications").get_vadjustment()
+        top = adj.get_value()
+        page = adj.get_page_size()
+        fb_y = self.flowbox_applications.get_allocation().y
+
+        for tile in self.category_tiles:
+            box = tile.get_allocation()
+            if box.y < 0:
+                # Not allocated yet, it'll queue another update once it is.
+                continue
+
+            tile_top = box.y + fb_y
+            tile_bottom = tile_top + box.height
+
+            if tile_bottom > top - page * LAZY_ICON_LOAD_MARGIN and tile_top < top + page * (1 + LAZY_ICON_LOAD_MARGIN):
+                if not tile.icon_requested:
+                    tile.load_icon()
+            elif tile_bottom < top - page * LAZY_ICON_CANCEL_MARGIN or tile_top > top + page * (1 + LAZY_ICON_CANCEL_MARGIN):
+                tile.cancel_icon()
+
+        return False
+
     def on_tile_keypress(self, row, event, data=None):
         if event.keyval in (Gdk.KEY_Tab, Gdk.KEY_ISO_Left_Tab):
             self.searchentry.grab_focus()
@@ -3023,24 +3547,16 @@ class Application(Gtk.Application):
         description = self.installer.get_description(pkginfo)
 
         if self.settings.get_boolean(prefs.HAMONIKR_SCREENSHOTS):
-            try:
-                from bs4 import BeautifulSoup
-                hamonikrpkgname = pkginfo.name.replace("-","_")
-                page = BeautifulSoup(urllib.request.urlopen("https://hamonikr.org/%s" % hamonikrpkgname, timeout=5), "lxml")
-                texts = page.find("div","xe_content")
-                text = texts.get_text()
-                if text is not None:
-                    description = text
-            except Exception as e:
-                pass
+            cached = descriptioncache.lookup(HAMONIKR_DESCRIPTION_SOURCE, pkginfo.name)
+            if cached is not None and cached.text is not None:
+                description = cached.text
 
-        app_description = self.builder.get_object("application_description")
+            # A stale one is shown until the new one arrives.
+            if (cached is None or not cached.is_fresh()) and self.claim_description_fetch(pkginfo):
+                thread = threading.Thread(target=self.hamonikr_description_thread, args=(pkginfo,), daemon=True)
+                thread.start()
 
-        if description not in (None, ''):
-            app_description.set_label(description)
-            app_description.show()
-        else:
-            app_description.hide()
+        self.set_description(description)
 
         box_reviews = self.builder.get_object("box_reviews")
 
@@ -3079,35 +3595,26 @@ class Application(Gtk.Application):
                 self.star_bars[i].set_fraction(0.0)
                 self.builder.get_object("stars_count_%d" % (i + 1)).set_label("")
 
-            reviews = review_info.reviews
-            reviews.sort(key=lambda x: x.date, reverse=True)
-
-            stars = [0, 0, 0, 0, 0]
-            n_reviews = len(reviews)
+            n_reviews = review_info.num_reviews
 
             if n_reviews > 0:
                 # TRANSLATORS: reviews heading in package details view
                 # label_reviews.set_text(_("Reviews"))
-                i = 0
-                for review in reviews:
-                    if i < 10:
-                        comment = review.comment.strip()
-                        comment = comment.replace("'", "\'")
-                        comment = comment.replace('"', '\"')
-                        comment = self.capitalize(comment)
-                        review_date = datetime.fromtimestamp(review.date).strftime("%Y.%m.%d")
-                        tile = ReviewTile(review.username, review_date, comment, review.rating)
-                        box_reviews.add(tile)
-                        i = i +1
-
-                    stars[review.rating - 1] += 1
+                for review in review_info.latest_reviews(10):
+                    comment = review.comment.strip()
+                    comment = comment.replace("'", "\'")
+                    comment = comment.replace('"', '\"')
+                    comment = self.capitalize(comment)
+                    review_date = datetime.fromtimestamp(review.date).strftime("%Y.%m.%d")
+                    tile = ReviewTile(review.username, review_date, comment, review.rating)
+                    box_reviews.add(tile)
 
                 for i in range(0, 5):
                     widget_idx = i + 1
                     label = self.builder.get_object("stars_count_%s" % widget_idx)
 
-                    label.set_label(str(stars[i]))
-                    self.star_bars[i].set_fraction(stars[i] / n_reviews)
+                    label.set_label(str(review_info.stars[i]))
+                    self.star_bars[i].set_fraction(review_info.stars[i] / n_reviews)
 
             add_your_own = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
             add_your_own.set_margin_start(12)
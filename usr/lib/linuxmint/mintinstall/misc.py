@@ -2,9 +2,11 @@
 
 import os
 import time
+import threading
 import requests
 import logging
-from typing import Callable
+from contextlib import contextmanager
+from typing import IO, Callable, Iterator
 
 # Environment variable is converted to a boolean value.
 DEBUG_MODE = bool(os.getenv("MINTINSTALL_DEBUG", "False").lower() in ("true", "1", "t"))
@@ -32,10 +34,41 @@ def debug(message: str) -> None:
         print(f"Mintinstall (DEBUG): {message}")
         logging.debug(message)
 
+def temporary_path(path: str) -> str:
+    """ Where to write the new contents of path before moving them into place; each thread gets its own """
+    return "%s.%d.tmp" % (path, threading.get_ident())
+
+@contextmanager
+def replacing(path: str) -> Iterator[str]:
+    """
+    Yields a temporary path to write the new contents of path to. It replaces
+    path when the block ends, or is deleted if the block raises, so readers
+    never see a partly written file.
+    """
+    tmp_path = temporary_path(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w") -> Iterator[IO]:
+    """ open(path, mode) for writing, through replacing() """
+    with replacing(path) as tmp_path:
+        with open(tmp_path, mode) as f:
+            yield f
+
 def networking_available(url: str = "https://8.8.8.8", timeout: int = 1, retries: int = 3) -> bool:
+    import network # network uses debug() from here
+
     for attempt in range(retries):
         try:
-            response = requests.get(url, timeout=timeout)
+            response = network.get(url, timeout=timeout)
             response.raise_for_status()  # Ensure the request was successful
             return True
         except requests.RequestException as e:
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+
+import threading
+import time
+import requests
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator
+from urllib.parse import urlsplit
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+from misc import debug
+
+# (connect, read) in seconds, for every request unless a caller knows better.
+TIMEOUT = (5, 15)
+# Hosts whose connections are kept alive at the same time.
+POOL_CONNECTIONS = 10
+# Connections per host. Requests beyond this wait for a free one instead of
+# opening more, so this also limits how hard we hit any single server.
+POOL_MAXSIZE = 4
+# How long a request waits for one of those to come free before it fails like
+# any other timeout (urllib3 would wait forever).
+POOL_TIMEOUT = 30
+
+class HostStats:
+    __slots__ = ("requests", "bytes", "seconds", "cache_hits", "not_modified")
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.cache_hits = 0
+        self.not_modified = 0
+
+    def __repr__(self):
+        return "%d requests, %d bytes, %.2fs, %d cache hits, %d not modified" % \
+            (self.requests, self.bytes, self.seconds, self.cache_hits, self.not_modified)
+
+_stats: Dict[str, HostStats] = {}
+_stats_lock = threading.Lock()
+
+def _host_stats(url: str) -> HostStats:
+    host = urlsplit(url).netloc
+    stats = _stats.get(host)
+    if stats is None:
+        stats = _stats.setdefault(host, HostStats())
+    return stats
+
+def _record(response: requests.Response, started: float) -> None:
+    elapsed = time.monotonic() - started
+    try:
+        nbytes = response.raw.tell()
+    except Exception:
+        nbytes = 0
+
+    with _stats_lock:
+        stats = _host_stats(response.url)
+        stats.requests += 1
+        stats.bytes += nbytes
+        stats.seconds += elapsed
+        if response.status_code == 304:
+            stats.not_modified += 1
+
+    debug("HTTP %s %s: %d, %d bytes, %.0f ms" % (response.request.method, response.url, response.status_code,
+                                                nbytes, elapsed * 1000))
+
+def record_cache_hit(url: str) -> None:
+    """ For callers that answered a request from their own cache without going to the network """
+    with _stats_lock:
+        _host_stats(url).cache_hits += 1
+    debug("HTTP cache hit: %s" % url)
+
+def get_stats() -> Dict[str, HostStats]:
+    """ Per-host counters since startup """
+    with _stats_lock:
+        return dict(_stats)
+
+class _PoolTimeout:
+    def _get_conn(self, timeout=None):
+        return super()._get_conn(timeout=POOL_TIMEOUT if timeout is None else timeout)
+
+class _HTTPConnectionPool(_PoolTimeout, HTTPConnectionPool):
+    pass
+
+class _HTTPSConnectionPool(_PoolTimeout, HTTPSConnectionPool):
+    pass
+
+class _Adapter(HTTPAdapter):
+    """ An HTTPAdapter whose blocking pools give up after POOL_TIMEOUT """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        try:
+            return super().send(request, **kwargs)
+        except EmptyPoolError as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+
+class Session(requests.Session):
+    """
+    A requests.Session with pooled keep-alive connections, default timeouts
+    and per-request accounting (bytes on the wire, time until the body was
+    read, 304s). Streamed responses are only accounted for when they're
+    opened with stream().
+    """
+    def __init__(self):
+        super().__init__()
+
+        adapter = _Adapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        response = super().send(request, **kwargs)
+
+        if not kwargs.get("stream"):
+            _record(response, started)
+        return response
+
+_session = None
+_session_lock = threading.Lock()
+
+def session() -> Session:
+    """ The process-wide session; safe to share between threads """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = Session()
+        return _session
+
+def is_not_found(error: Exception) -> bool:
+    """ Whether a raise_for_status() error means the server has nothing there, rather than a failure """
+    return isinstance(error, requests.HTTPError) and error.response is not None \
+        and error.response.status_code in (404, 410)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return session().get(url, **kwargs)
+
+@contextmanager
+def stream(url: str, **kwargs) -> Iterator[requests.Response]:
+    """
+    GET url without reading the body up front. The response is closed and
+    accounted for (bytes actually read, time until then) when the block ends.
+    """
+    started = time.monotonic()
+    with session().get(url, stream=True, **kwargs) as response:
+        try:
+            yield response
+        finally:
+            _record(response, started)
@@ -1,46 +1,165 @@
 import os
+import re
+import sys
 import threading
+import traceback
 import json
+import mmap
+import zlib
+import struct
+import base64
 import requests
-import multiprocessing
+import network
+from collections.abc import Mapping
+from operator import attrgetter
 from pathlib import Path
 from gi.repository import GLib, GObject
-from misc import print_timing
-from typing import List, Dict, Tuple, Optional
+from misc import atomic_write, print_timing
+from typing import Callable, List, Dict, Iterator, Tuple, Optional, Set
 
+# Eski (JSON) önbellek; yalnızca tek seferlik dönüştürme için okunur.
 REVIEWS_CACHE = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "reviews.json")
+REVIEWS_STORE = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "reviews.bin")
+REVIEWS_URL = "https://community.linuxmint.com/data/new-reviews.list"
+
+# Artımlı indirmede, kayıtlı dosyanın sonunun sunucudakiyle hâlâ aynı olduğunu
+# doğrulamak için yeniden istenen bayt sayısı.
+SYNC_OVERLAP = 256
+
+# Eşitleme zamanlaması (saniye). İlk eşitleme açılıştan sonra ertelenir,
+# ardından düzenli aralıklarla yinelenir; ağ hatalarında bekleme süresi
+# REFRESH_RETRY_MIN'den başlayıp REFRESH_RETRY_MAX'a kadar ikiye katlanır.
+REFRESH_FIRST_DELAY = 10
+REFRESH_INTERVAL = 4 * 60 * 60
+REFRESH_RETRY_MIN = 60
+REFRESH_RETRY_MAX = 60 * 60
+# Pencere gizliyken eşitleme atlanır ve bu süre sonra yeniden denenir.
+REFRESH_HIDDEN_RECHECK = 5 * 60
+
+# reviews.bin düzeni (tüm sayılar little-endian):
+#   başlık  : STORE_HEADER
+#   meta    : JSON (indirme durumu, ör. "size")
+#   isimler : "\n" ile ayrılmış paket adları, dizin kayıtlarıyla aynı sırada
+#   dizin   : paket başına bir STORE_RECORD (istatistikler + inceleme bloğunun konumu);
+#             STORE_FLAG_RANKED varsa kayıtlar puana göre sıralıdır (bkz. rank_key)
+#   veri    : paket başına zlib ile sıkıştırılmış bir blok; her inceleme REVIEW_RECORD +
+#             kullanıcı adı + yorum, en yeniden en eskiye sıralı (sürüm 2'de sıkıştırılmamış)
+STORE_MAGIC = b"MIRS"
+STORE_VERSION = 3
+# Sürüm 2 dosyaları hâlâ okunabilir; bir sonraki eşitlemede sürüm 3 olarak yazılır.
+STORE_READABLE_VERSIONS = (2, 3)
+STORE_COMPRESSION_LEVEL = 6
+# En yeni incelemeler okunurken bloğun her seferinde açılan kısmı.
+STORE_DECOMPRESS_STEP = 4096
+# magic, version, flags, num_packages, num_reviews, meta_offset, meta_length, names_offset, names_length, index_offset
+STORE_HEADER = struct.Struct("<4sHHIIQIQIQ")
+STORE_FLAG_RANKED = 0x1
+# avg_rating, score, num_reviews, data_offset, data_length, 1..5 yıldız sayıları
+STORE_RECORD = struct.Struct("<ddIQI5I")
+# date, rating, username_length, comment_length
+REVIEW_RECORD = struct.Struct("<qBHI")
+# REVIEW_RECORD alanlarının sınırları; yazılırken bunlara sığdırılır (bkz. _encode_review).
+REVIEW_DATE_RANGE = (-2 ** 63, 2 ** 63 - 1)
+REVIEW_RATING_RANGE = (0, 255)
+REVIEW_USERNAME_MAX = 0xFFFF
+REVIEW_COMMENT_MAX = 0xFFFFFFFF
 
 class Review:
-    def __init__(self, packagename: str, date: str, username: str, rating: int, comment: str, version: Optional[str] = None):
+    # Önbellekte on binlerce inceleme bulunur; __dict__ yerine __slots__ kullanılır,
+    # paket ve kullanıcı adları paylaşılır, tarih tamsayı zaman damgası olarak tutulur.
+    __slots__ = ("packagename", "date", "username", "rating", "comment")
+
+    def __init__(self, packagename: str, date: int, username: str, rating: int, comment: str):
         """İnceleme nesnesi için constructor."""
-        self.packagename = packagename
-        self.date = date
-        self.username = username
-        self.rating = rating
+        self.packagename = sys.intern(packagename)
+        self.date = int(float(date))
+        self.username = sys.intern(username)
+        self.rating = int(rating)
         self.comment = comment
-        self.version = version  # Ek alan
 
     @classmethod
     def from_json(cls, json_data: dict) -> 'Review':
         """JSON verisinden Review nesnesi oluşturur."""
-        return cls(**json_data)
+        return cls(json_data["packagename"], json_data["date"], json_data["username"],
+                   json_data["rating"], json_data["comment"])
+
+def _clamp(value: int, bounds: Tuple[int, int]) -> int:
+    return max(bounds[0], min(bounds[1], value))
+
+def _truncate_utf8(data: bytes, limit: int) -> bytes:
+    """data'yı en fazla limit bayta kısaltır; yarım kalan UTF-8 karakteri atılır."""
+    if len(data) <= limit:
+        return data
+    return data[:limit].decode(errors="ignore").encode()
+
+def _encode_review(review: 'Review') -> Tuple[bytes, bytes, bytes]:
+    """Bir incelemeyi REVIEW_RECORD + kullanıcı adı + yorum olarak kodlar.
+
+    Alanlara sığmayan değerler (ör. eski önbellekten gelen 300 puan ya da
+    64 KiB'tan uzun bir kullanıcı adı) kırpılır; aksi halde struct.error
+    yüzünden reviews.bin hiç yazılamaz ve eski dosya kullanılmaya devam eder.
+    """
+    username = _truncate_utf8(review.username.encode(), REVIEW_USERNAME_MAX)
+    comment = _truncate_utf8(review.comment.encode(), REVIEW_COMMENT_MAX)
+    record = REVIEW_RECORD.pack(_clamp(review.date, REVIEW_DATE_RANGE), _clamp(review.rating, REVIEW_RATING_RANGE),
+                                len(username), len(comment))
+    return record, username, comment
 
 class ReviewInfo:
-    def __init__(self, name: str, score: float = 0.0, avg_rating: float = 0.0, num_reviews: int = 0, version: Optional[str] = None):
+    __slots__ = ("name", "_reviews", "_store", "_slot", "score", "avg_rating", "num_reviews", "stars")
+
+    def __init__(self, name: str, score: float = 0.0, avg_rating: float = 0.0, num_reviews: int = 0):
         """Paket incelemeleri hakkında bilgi tutar."""
-        self.name = name
-        self.reviews: List[Review] = []
-        self.categories: List[str] = []  # Boş kalabilir
-        self.version = version  # Ek alan
+        self.name = sys.intern(name)
+        self._reviews: Optional[List[Review]] = []
+        self._store: Optional['ReviewStore'] = None
+        self._slot = -1
         self.score = score
         self.avg_rating = avg_rating
         self.num_reviews = num_reviews
+        # 1'den 5'e kadar her yıldız için inceleme sayısı
+        self.stars: Tuple[int, ...] = (0, 0, 0, 0, 0)
+
+    @property
+    def reviews(self) -> List[Review]:
+        """İncelemeleri döndürür; depodan gelen nesnelerde ilk erişimde çözülür."""
+        if self._reviews is None:
+            self._reviews = self._store.read_reviews(self._slot)
+        return self._reviews
+
+    @reviews.setter
+    def reviews(self, reviews: List[Review]) -> None:
+        self._reviews = reviews
+
+    def latest_reviews(self, count: int) -> List[Review]:
+        """En yeni 'count' incelemeyi döndürür; depodaki bloğun yalnızca gereken kısmı çözülür."""
+        if self._reviews is None:
+            return self._store.read_reviews(self._slot, count)
+        return self._reviews[:count]
+
+    def encode_reviews(self) -> bytes:
+        """İncelemeleri depo biçiminde kodlar; hiç çözülmemiş sıkıştırılmış bloklar olduğu gibi kopyalanır."""
+        if self._reviews is None:
+            block = self._store.read_block(self._slot)
+            return block if self._store.compressed else zlib.compress(block, STORE_COMPRESSION_LEVEL)
+
+        chunks = []
+        for review in self._reviews:
+            chunks.extend(_encode_review(review))
+        return zlib.compress(b"".join(chunks), STORE_COMPRESSION_LEVEL)
 
     def update_stats(self) -> None:
-        """Güncellemeler için istatistikleri yeniden hesaplar."""
+        """Güncellemeler için istatistikleri yeniden hesaplar; incelemeler en yeniden eskiye sıralanır."""
+        self.reviews.sort(key=attrgetter("date"), reverse=True)
         self.num_reviews = len(self.reviews)
         sum_rating = sum(review.rating for review in self.reviews)
 
+        stars = [0, 0, 0, 0, 0]
+        for review in self.reviews:
+            if 1 <= review.rating <= 5:
+                stars[review.rating - 1] += 1
+        self.stars = tuple(stars)
+
         if self.num_reviews > 0:
             self.avg_rating = round(sum_rating / self.num_reviews, 1)
             significant_votes = min(10, self.num_reviews)
@@ -54,10 +173,169 @@ class ReviewInfo:
     def from_json(cls, json_data: dict) -> 'ReviewInfo':
         """ReviewInfo nesnesini JSON'dan oluşturur."""
         reviews = [Review.from_json(review) for review in json_data.get("reviews", [])]
-        instance = cls(json_data["name"], json_data["score"], json_data["avg_rating"], json_data["num_reviews"], json_data.get("version"))
+        # parse_review_line'ın kabul etmeyeceği puanlar eski önbellekte de atlanır.
+        reviews = [review for review in reviews if 1 <= review.rating <= 5]
+        instance = cls(json_data["name"], json_data["score"], json_data["avg_rating"], json_data["num_reviews"])
         instance.reviews = reviews
+        instance.update_stats()
         return instance
 
+# İncelemesi olmayan paketler için paylaşılan boş kayıt; değiştirilmemelidir.
+EMPTY_REVIEW_INFO = ReviewInfo("")
+
+def rank_key(info: ReviewInfo) -> Tuple[float, str]:
+    """En yüksek puanlı paket önce gelecek şekilde sıralama anahtarı; eşitlikte ada bakılır."""
+    return -info.score, info.name
+
+def ranked_names(cache: Mapping) -> List[str]:
+    """Paket adlarını puana göre azalan sırada döndürür."""
+    return [info.name for info in sorted(cache.values(), key=rank_key)]
+
+class ReviewStore(Mapping):
+    """reviews.bin dosyasını belleğe eşler.
+
+    Paket istatistikleri dizinden hemen okunur; inceleme blokları ancak
+    ReviewInfo.reviews istendiğinde çözülür. package_names verilirse yalnızca
+    bu paketler görünür, dosyanın kendisi tam kalır.
+    """
+    def __init__(self, path: str, package_names: Optional[Set[str]] = None):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self._flags, num_packages, self.num_reviews,
+         meta_offset, meta_length, names_offset, names_length, self._index_offset) = STORE_HEADER.unpack_from(self._map, 0)
+
+        if magic != STORE_MAGIC or version not in STORE_READABLE_VERSIONS:
+            raise ValueError("unsupported reviews store (version %d)" % version)
+        self.compressed = version >= 3
+
+        self.meta = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        self.size = self.meta.get("size", 0)
+
+        names = self._map[names_offset:names_offset + names_length].decode().split("\n") if num_packages else []
+        self._names = names
+        self._slots = {name: slot for slot, name in enumerate(names)
+                       if package_names is None or name in package_names}
+        self._infos: Dict[str, ReviewInfo] = {}
+
+    def ranked_names(self) -> List[str]:
+        """Görünen paketlerin adlarını puana göre azalan sırada döndürür.
+
+        Dosya sıralı yazıldıysa dizin sırası zaten sıralamadır; hiçbir
+        inceleme bloğuna dokunulmaz.
+        """
+        if self._flags & STORE_FLAG_RANKED:
+            return list(self._slots)
+        return sorted(self._slots, key=lambda name: (-self._record(self._slots[name])[1], name))
+
+    def __getitem__(self, name: str) -> ReviewInfo:
+        """Paketin ReviewInfo nesnesini döndürür; nesne ilk istendiğinde oluşturulur."""
+        info = self._infos.get(name)
+        if info is None:
+            slot = self._slots[name]
+            record = self._record(slot)
+            avg_rating, score, num_reviews, _offset, _length = record[:5]
+            info = ReviewInfo(name, score, avg_rating, num_reviews)
+            info.stars = record[5:]
+            info._reviews = None
+            info._store = self
+            info._slot = slot
+            info = self._infos.setdefault(name, info)
+        return info
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._slots
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._slots)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _record(self, slot: int) -> Tuple:
+        return STORE_RECORD.unpack_from(self._map, self._index_offset + slot * STORE_RECORD.size)
+
+    def read_block(self, slot: int) -> bytes:
+        """Bir paketin kodlanmış inceleme bloğunu döndürür."""
+        offset, length = self._record(slot)[3:5]
+        return self._map[offset:offset + length]
+
+    def _payload(self, block: bytes, step: int) -> Iterator[bytes]:
+        """Bloğun açılmış içeriğini parça parça döndürür."""
+        if not self.compressed:
+            yield block
+            return
+        decompressor = zlib.decompressobj()
+        for pos in range(0, len(block), step):
+            yield decompressor.decompress(block[pos:pos + step])
+        yield decompressor.flush()
+
+    def read_reviews(self, slot: int, limit: Optional[int] = None) -> List[Review]:
+        """Bir paketin inceleme bloğunu Review nesnelerine çözer.
+
+        limit verilirse yalnızca en yeni incelemeler çözülür ve blok yalnızca
+        bunlar için gereken yere kadar açılır.
+        """
+        name = self._names[slot]
+        block = self.read_block(slot)
+        step = STORE_DECOMPRESS_STEP if limit is not None else max(len(block), 1)
+        reviews = []
+        pending = b""
+        for data in self._payload(block, step):
+            pending += data
+            pos = 0
+            while limit is None or len(reviews) < limit:
+                if len(pending) - pos < REVIEW_RECORD.size:
+                    break
+                date, rating, username_length, comment_length = REVIEW_RECORD.unpack_from(pending, pos)
+                start = pos + REVIEW_RECORD.size
+                end = start + username_length + comment_length
+                if end > len(pending):
+                    break
+                username = pending[start:start + username_length].decode()
+                comment = pending[start + username_length:end].decode()
+                reviews.append(Review(name, date, username, rating, comment))
+                pos = end
+            if limit is not None and len(reviews) >= limit:
+                break
+            pending = pending[pos:]
+        return reviews
+
+    @staticmethod
+    def write(path: str, cache: Dict[str, ReviewInfo], meta: dict) -> None:
+        """Önbelleği reviews.bin biçiminde, paketler puana göre sıralı olarak yazar; dosya atomik olarak değiştirilir."""
+        names = ranked_names(cache)
+        names_data = "\n".join(names).encode()
+        meta_data = json.dumps(meta).encode()
+
+        meta_offset = STORE_HEADER.size
+        names_offset = meta_offset + len(meta_data)
+        index_offset = names_offset + len(names_data)
+        data_offset = index_offset + len(names) * STORE_RECORD.size
+
+        index = bytearray()
+        blocks = []
+        num_reviews = 0
+        for name in names:
+            info = cache[name]
+            block = info.encode_reviews()
+            index += STORE_RECORD.pack(info.avg_rating, info.score, info.num_reviews, data_offset, len(block), *info.stars)
+            blocks.append(block)
+            data_offset += len(block)
+            num_reviews += info.num_reviews
+
+        header = STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, STORE_FLAG_RANKED, len(names), num_reviews,
+                                   meta_offset, len(meta_data), names_offset, len(names_data), index_offset)
+
+        # Her yazarın kendi geçici dosyası olur; aynı anda iki eşitleme birbirinin dosyasını bozamaz.
+        with atomic_write(path, "wb") as f:
+            f.write(header)
+            f.write(meta_data)
+            f.write(names_data)
+            f.write(index)
+            for block in blocks:
+                f.write(block)
+
 class JsonObject:
     def __init__(self, cache: Dict[str, ReviewInfo], size: int):
         """JSON verilerini tutan nesne."""
@@ -70,131 +348,414 @@ class JsonObject:
         cache = {key: ReviewInfo.from_json(info) for key, info in json_data["cache"].items()}
         return cls(cache, int(json_data["size"]))
 
+class ReviewStream:
+    """Yanıt gövdesini satırlara böler; okunan bayt sayısını ve son baytları tutar."""
+    def __init__(self, response: requests.Response, expected_prefix: bytes = b""):
+        self.response = response
+        self.expected_prefix = expected_prefix
+        self.size = 0
+        self.tail = b""
+        self.prefix_matched = True
+
+    def lines(self) -> Iterator[bytes]:
+        """Gövdedeki satırları döndürür; beklenen önek tutmazsa prefix_matched False olur ve durur."""
+        pending = b""
+        prefix = self.expected_prefix
+        for chunk in self.response.iter_content(chunk_size=65536):
+            if not chunk:
+                continue
+            self.size += len(chunk)
+            self.tail = (self.tail + chunk)[-SYNC_OVERLAP:]
+
+            if prefix:
+                pending += chunk
+                if len(pending) < len(prefix):
+                    continue
+                if not pending.startswith(prefix):
+                    self.prefix_matched = False
+                    return
+                chunk = pending[len(prefix):]
+                pending = b""
+                prefix = b""
+
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+
+        if prefix:
+            # Gövde beklenen önekten kısa; dosya küçülmüş olmalı.
+            self.prefix_matched = False
+            return
+
+        if pending:
+            yield pending
+
+    def sync_meta(self, start: int = 0) -> dict:
+        """Sonraki artımlı indirme için gereken durumu döndürür."""
+        headers = self.response.headers
+        # Satır ortasında biten bir dosyanın sonuna ekleme yapılamaz, bir sonraki sefer tamamı indirilir.
+        tail = self.tail if self.tail.endswith(b"\n") else b""
+        return {
+            "size": start + self.size,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "tail": base64.b64encode(tail).decode()
+        }
+
+def parse_review_line(line: bytes) -> Optional[Review]:
+    """new-reviews.list içindeki '~~~' ile ayrılmış bir satırı çözer.
+
+    Çözülemeyen satırlar (alan sayısı, tarih ya da puan hatalı) için None
+    döndürür; tek bir bozuk satır yüzünden eşitlemenin tamamı başarısız olmaz.
+    """
+    try:
+        elements = line.decode().split("~~~")
+        if len(elements) != 5:
+            return None
+        review = Review(elements[0], elements[1], elements[2], int(elements[3]), elements[4])
+    except (ValueError, OverflowError):
+        return None
+    if not 1 <= review.rating <= 5:
+        return None
+    return review
+
+def _parse_full(stream: ReviewStream) -> Dict[str, ReviewInfo]:
+    """Listenin tamamından yeni bir önbellek oluşturur."""
+    new_reviews = {}
+    last_package = None
+    for line in stream.lines():
+        review = parse_review_line(line)
+        if review is None:
+            continue
+        if last_package and last_package.name == review.packagename:
+            last_package.reviews.append(review)
+        else:
+            last_package = new_reviews.setdefault(review.packagename, ReviewInfo(review.packagename))
+            last_package.reviews.append(review)
+    for info in new_reviews.values():
+        info.update_stats()
+    return new_reviews
+
+def _merge_delta(stream: ReviewStream, cache: Mapping) -> Tuple[Dict[str, ReviewInfo], Set[str]]:
+    """Listenin sonuna eklenen satırları mevcut önbelleğe katar.
+
+    Yalnızca değişen paketler kopyalanır ve istatistikleri yeniden hesaplanır;
+    diğer paketlerin ReviewInfo nesneleri (ve çözülmemiş blokları) aynen kalır.
+    """
+    merged = dict(cache)
+    changed = set()
+    for line in stream.lines():
+        review = parse_review_line(line)
+        if review is None:
+            continue
+        name = review.packagename
+        if name not in changed:
+            info = ReviewInfo(name)
+            if name in merged:
+                info.reviews = list(merged[name].reviews)
+            merged[name] = info
+            changed.add(name)
+        # _parse_full ile aynı kural: her satır ayrı bir inceleme olarak sayılır,
+        # böylece artımlı eşitleme ile tam indirme aynı önbelleği üretir.
+        merged[name].reviews.append(review)
+
+    for name in changed:
+        merged[name].update_stats()
+    return merged, changed
+
+def _changed_stats(old: Mapping, new: Mapping) -> Set[str]:
+    """İstatistikleri değişen, eklenen ya da kaldırılan paketlerin adlarını döndürür."""
+    changed = set(old.keys()) ^ set(new.keys())
+    for name, info in new.items():
+        if name in changed:
+            continue
+        previous = old[name]
+        if (previous.score, previous.avg_rating, previous.num_reviews) != (info.score, info.avg_rating, info.num_reviews):
+            changed.add(name)
+    return changed
+
+def _content_range_start(response: requests.Response) -> int:
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else -1
+
+def sync_reviews(url: str, cache: Mapping, meta: dict) -> Optional[Tuple[Dict[str, ReviewInfo], dict, Set[str]]]:
+    """İnceleme listesini sunucuyla eşitler.
+
+    Değişiklik yoksa None döndürür. Aksi halde (yeni önbellek, yeni meta,
+    değişen paketler) döndürür. Önceki indirmenin durumu biliniyorsa yalnızca
+    dosyanın sonuna eklenen kısım istenir; son SYNC_OVERLAP bayt yeniden
+    alınıp karşılaştırılarak dosyanın yalnızca büyüdüğü doğrulanır, aksi halde
+    liste baştan indirilir.
+    """
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    size = meta.get("size", 0)
+    tail = base64.b64decode(meta.get("tail") or "")
+
+    if size and tail and len(cache) > 0:
+        start = size - len(tail)
+        range_headers = dict(headers)
+        range_headers["Range"] = "bytes=%d-" % start
+        # Aralıklar sıkıştırılmamış gövdeye göre hesaplanır.
+        range_headers["Accept-Encoding"] = "identity"
+
+        with network.stream(url, headers=range_headers) as r:
+            if r.status_code == 304:
+                return None
+            if r.status_code == 206 and _content_range_start(r) == start:
+                stream = ReviewStream(r, tail)
+                merged, changed = _merge_delta(stream, cache)
+                if stream.prefix_matched:
+                    if not changed and stream.size == len(tail):
+                        return None
+                    print(f"MintInstall: Merged {stream.size - len(tail)} bytes of new reviews")
+                    return merged, stream.sync_meta(start), changed
+                print("MintInstall: Reviews list was rewritten, downloading it again")
+            elif r.status_code not in (200, 206, 416):
+                r.raise_for_status()
+                return None
+            # 200: sunucu aralık desteklemiyor, 416: dosya küçülmüş.
+
+    # Tam liste sıkıştırılmış olarak istenir; requests gövdeyi okurken açar.
+    headers["Accept-Encoding"] = "gzip, deflate"
+    with network.stream(url, headers=headers) as r:
+        if r.status_code == 304:
+            return None
+        r.raise_for_status()
+
+        content_length = int(r.headers.get("content-length", 0))
+        if "Content-Encoding" not in r.headers and content_length == size and content_length > 0:
+            return None
+
+        stream = ReviewStream(r)
+        new_reviews = _parse_full(stream)
+        return new_reviews, stream.sync_meta(), _changed_stats(cache, new_reviews)
+
+class ReviewSnapshot:
+    """Bir eşitlemenin sonucu: incelemeler ve puan sıralaması.
+
+    Oluşturulduktan sonra hiç değiştirilmez; okuyucular kilit almadan
+    kullanır, yeni eşitleme yeni bir görüntü oluşturup eskisinin yerine koyar.
+    """
+    __slots__ = ("reviews", "ranking")
+
+    def __init__(self, reviews: Mapping, ranking: List[str]):
+        self.reviews = reviews
+        self.ranking = ranking
+
 class ReviewCache(GObject.Object):
     __gsignals__ = {
-        'reviews-updated': (GObject.SignalFlags.RUN_LAST, None, ()),
+        # Parametre: istatistikleri değişen paket adlarının kümesi.
+        'reviews-updated': (GObject.SignalFlags.RUN_LAST, None, (object,)),
     }
 
     @print_timing
-    def __init__(self):
-        """ReviewCache sınıfının constructor'ı."""
+    def __init__(self, package_names: Optional[Set[str]] = None):
+        """ReviewCache sınıfının constructor'ı.
+
+        package_names verilirse bellekte yalnızca bu paketlerin incelemeleri
+        tutulur; diskteki önbellek her zaman tüm listeyi içerir. Yalnızca
+        diskteki önbellek açılır; ağdan eşitleme schedule_refresh ile başlar.
+        """
         super().__init__()
-        self._cache_lock = threading.Lock()
-        self._reviews, self._size = self._load_cache()
-        self.proc = None
-        self._update_cache()
+        self._cancelled = threading.Event()
+        self._can_refresh: Optional[Callable[[], bool]] = None
+        self._refresh_source = 0
+        self._retry_delay = 0
+        self._package_names = frozenset(package_names) if package_names is not None else None
+        reviews = self._load_cache(self._package_names)
+        self._snapshot = ReviewSnapshot(reviews, reviews.ranked_names() if isinstance(reviews, ReviewStore) else [])
 
     def kill(self) -> None:
-        """Çalışmakta olan işlemi sonlandırır."""
-        if self.proc is not None:
-            self.proc.terminate()
-            self.proc = None
+        """Zamanlanmış eşitlemeleri iptal eder ve çalışmakta olanın sonucunun uygulanmasını engeller."""
+        self._cancelled.set()
+        if self._refresh_source:
+            GLib.source_remove(self._refresh_source)
+            self._refresh_source = 0
+
+    def schedule_refresh(self, can_refresh: Optional[Callable[[], bool]] = None) -> None:
+        """Ağdan eşitlemeyi zamanlar; arayüz ilk kez çizildikten sonra çağrılmalıdır.
+
+        İlk eşitleme REFRESH_FIRST_DELAY saniye sonra, ana döngü boşta
+        kaldığında başlar; sonrakiler REFRESH_INTERVAL aralıklarla yapılır.
+        can_refresh False döndürürse (ör. pencere gizliyse) eşitleme ertelenir.
+        """
+        self._can_refresh = can_refresh
+        self._schedule_refresh(REFRESH_FIRST_DELAY)
 
     def keys(self) -> List[str]:
         """Önbellekteki tüm paket adlarını döndürür."""
-        with self._cache_lock:
-            return list(self._reviews.keys())
+        return list(self._snapshot.reviews.keys())
 
     def values(self) -> List[ReviewInfo]:
         """Önbellekteki tüm ReviewInfo nesnelerini döndürür."""
-        with self._cache_lock:
-            return list(self._reviews.values())
+        return list(self._snapshot.reviews.values())
+
+    def ranked_names(self) -> List[str]:
+        """İncelemesi olan paketlerin adlarını puana göre azalan sırada döndürür.
+
+        Sıralama her eşitlemeden sonra bir kez hesaplanır; "En Çok Beğenilenler"
+        gibi listeler baştan yürüyüp yeterli paket bulunca durabilir.
+        """
+        return self._snapshot.ranking
 
     def __getitem__(self, key: str) -> ReviewInfo:
-        """Bir paket adı verildiğinde ilgili ReviewInfo nesnesini döndürür."""
-        with self._cache_lock:
-            return self._reviews.get(key, ReviewInfo(key))
+        """Bir paket adı verildiğinde ilgili ReviewInfo nesnesini, yoksa EMPTY_REVIEW_INFO'yu döndürür."""
+        return self._snapshot.reviews.get(key, EMPTY_REVIEW_INFO)
 
     def __contains__(self, name: str) -> bool:
         """Önbellekte belirli bir paket olup olmadığını kontrol eder."""
-        with self._cache_lock:
-            return name in self._reviews
+        return name in self._snapshot.reviews
 
     def __len__(self) -> int:
         """Önbellekteki toplam paket sayısını döndürür."""
-        with self._cache_lock:
-            return len(self._reviews)
+        return len(self._snapshot.reviews)
 
-    def _load_cache(self) -> Tuple[Dict[str, ReviewInfo], int]:
-        """Önbelleği diskteki dosyadan yükler."""
-        path = Path(REVIEWS_CACHE)
+    def _load_cache(self, package_names: Optional[frozenset] = None) -> Mapping:
+        """Önbelleği diskteki dosyadan belleğe eşler."""
+        path = Path(REVIEWS_STORE)
         path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            self._migrate_json_cache()
         try:
-            with path.open(mode='r', encoding="utf8") as f:
-                json_object = JsonObject.from_json(json.load(f))
-                print(f"MintInstall: Cache loaded successfully with {json_object.size} reviews")
-                return json_object.cache, json_object.size
+            store = ReviewStore(str(path), package_names)
+            print(f"MintInstall: Cache loaded successfully with {store.num_reviews} reviews")
+            return store
         except Exception as e:
             print(f"MintInstall: Cannot open reviews cache: {e}")
-            return {}, 0
-
-    def _save_cache(self, cache: Dict[str, ReviewInfo], size: int) -> None:
-        """Önbelleği diske kaydeder."""
-        path = Path(REVIEWS_CACHE)
-        with self._cache_lock:
-            try:
-                with path.open(mode='w', encoding="utf8") as f:
-                    pobj = JsonObject(cache, size)
-                    json.dump(pobj, f, default=lambda o: o.__dict__, indent=4)
-                print("MintInstall: Cache saved successfully")
-            except Exception as e:
-                print(f"MintInstall: Could not save review cache: {e}")
+            return {}
+
+    def _retain_known_packages(self, cache: Dict[str, ReviewInfo]) -> Dict[str, ReviewInfo]:
+        """Kurulum önbelleğinde olmayan paketlerin incelemelerini bırakır."""
+        if self._package_names is None:
+            return cache
+        return {name: info for name, info in cache.items() if name in self._package_names}
+
+    def _migrate_json_cache(self) -> None:
+        """Eski reviews.json önbelleğini bir kereliğine reviews.bin biçimine dönüştürür."""
+        legacy_path = Path(REVIEWS_CACHE)
+        if not legacy_path.exists():
+            return
+        try:
+            with legacy_path.open(mode='r', encoding="utf8") as f:
+                json_object = JsonObject.from_json(json.load(f))
+            ReviewStore.write(REVIEWS_STORE, json_object.cache, {"size": json_object.size})
+            legacy_path.unlink()
+            print("MintInstall: Reviews cache migrated to the indexed format")
+        except Exception as e:
+            print(f"MintInstall: Could not migrate reviews cache: {e}")
+
+    def _save_cache(self, cache: Dict[str, ReviewInfo], meta: dict) -> None:
+        """Önbelleği bir sonraki açılış için diske kaydeder.
+
+        Dosya atomik olarak değiştirildiğinden okuyucuları kilitlemeye gerek yoktur;
+        eski dosyayı eşlemiş nesneler onu kullanmaya devam eder.
+        """
+        try:
+            ReviewStore.write(REVIEWS_STORE, cache, meta)
+            print("MintInstall: Cache saved successfully")
+        except Exception as e:
+            print(f"MintInstall: Could not save review cache: {e}")
+
+    def _schedule_refresh(self, seconds: int) -> None:
+        """Bekleyen zamanlamanın yerine 'seconds' saniye sonrası için yenisini kurar."""
+        if self._cancelled.is_set():
+            return
+        if self._refresh_source:
+            GLib.source_remove(self._refresh_source)
+        self._refresh_source = GLib.timeout_add_seconds(seconds, self._on_refresh_due)
+
+    def _on_refresh_due(self) -> bool:
+        # Süre dolduğunda bile, bekleyen çizim ve kullanıcı olayları önce işlensin.
+        self._refresh_source = GLib.idle_add(self._start_refresh, priority=GLib.PRIORITY_LOW)
+        return False
+
+    def _start_refresh(self) -> bool:
+        """Eşitlemeyi başlatır ya da pencere gizliyse erteler."""
+        self._refresh_source = 0
+        if self._can_refresh is not None and not self._can_refresh():
+            self._schedule_refresh(REFRESH_HIDDEN_RECHECK)
+        else:
+            self._update_cache()
+        return False
+
+    def _on_refresh_finished(self, succeeded: bool) -> bool:
+        """Bir sonraki eşitlemeyi zamanlar; başarısız denemelerden sonra bekleme süresi artar."""
+        if succeeded:
+            self._retry_delay = 0
+            self._schedule_refresh(REFRESH_INTERVAL)
+        else:
+            self._retry_delay = min(max(self._retry_delay * 2, REFRESH_RETRY_MIN), REFRESH_RETRY_MAX)
+            print(f"MintInstall: Retrying reviews refresh in {self._retry_delay} seconds")
+            self._schedule_refresh(self._retry_delay)
+        return False
 
     def _update_cache(self) -> None:
         """Önbelleği günceller."""
-        thread = threading.Thread(target=self._update_reviews_thread)
+        thread = threading.Thread(target=self._update_reviews_thread, daemon=True)
         thread.start()
 
-    @print_timing
     def _update_reviews_thread(self) -> None:
-        """İncelemeleri güncellemek için bir iş parçacığı çalıştırır."""
-        success = multiprocessing.Value('b', False)
-        current_size = multiprocessing.Value('d', self._size)
-        self.proc = multiprocessing.Process(target=self._update_cache_process, args=(success, current_size))
-        self.proc.start()
-        self.proc.join()
-        self.proc = None
-
-        if success.value:
-            with self._cache_lock:
-                self._reviews, self._size = self._load_cache()
-                GLib.idle_add(self.emit_reviews_updated)
-
-    def emit_reviews_updated(self, data=None) -> None:
-        """Güncellemeyi diğer bileşenlere bildirir."""
-        print("MintInstall: Emitting reviews-updated signal")
-        self.emit("reviews-updated")
-
-    def _update_cache_process(self, success: multiprocessing.Value, current_size: multiprocessing.Value) -> None:
-        """İnternetten yeni incelemeleri indirir ve önbelleği günceller."""
-        new_reviews = {}
+        """Eşitleme iş parçacığı; sonucu zamanlayıcıya ana döngüde bildirir.
+
+        Beklenmeyen bir hata (ör. bozuk bir bloktan zlib.error) başarısız deneme
+        sayılır; böylece bekleme süresi uygulanır ve periyodik eşitleme durmaz.
+        """
+        succeeded = False
         try:
-            with requests.get("https://community.linuxmint.com/data/new-reviews.list", timeout=30, stream=True) as r:
-                if r.status_code == 200:
-                    content_length = int(r.headers.get("content-length", 0))
-                    if content_length != current_size.value:
-                        last_package = None
-                        for line in r.iter_lines():
-                            decoded = line.decode()
-                            elements = decoded.split("~~~")
-                            if len(elements) == 5:
-                                review = Review(elements[0], elements[1], elements[2], int(elements[3]), elements[4])
-                                if last_package and last_package.name == elements[0]:
-                                    last_package.reviews.append(review)
-                                else:
-                                    if last_package:
-                                        last_package.update_stats()
-                                    last_package = new_reviews.setdefault(elements[0], ReviewInfo(elements[0]))
-                                    last_package.reviews.append(review)
-                        if last_package:
-                            last_package.update_stats()
-                        self._save_cache(new_reviews, content_length)
-                        print("MintInstall: Downloaded new reviews")
-                        success.value = True
-                    else:
-                        print("MintInstall: No new reviews")
-                else:
-                    print(f"MintInstall: Could not download updated reviews: {r.reason}")
-                    success.value = False
+            succeeded = self._refresh_reviews()
+        except Exception as e:
+            print(f"MintInstall: Reviews refresh failed: {e}")
+            traceback.print_exc()
+        finally:
+            GLib.idle_add(self._on_refresh_finished, succeeded)
+
+    @print_timing
+    def _refresh_reviews(self) -> bool:
+        """İncelemeleri arka planda eşitler; ayrıştırılan sonuç diskten yeniden okunmadan kullanılır.
+
+        Ağ ya da ayrıştırma hatasında False döndürür.
+        """
+        # Eşitleme, bellekteki süzülmüş kopya yerine diskteki tam önbellek üzerinden yapılır.
+        try:
+            base = ReviewStore(REVIEWS_STORE)
+        except Exception:
+            base = {}
+
+        try:
+            result = sync_reviews(REVIEWS_URL, base, getattr(base, "meta", {}))
         except requests.exceptions.RequestException as e:
             print(f"MintInstall: Problem attempting to access reviews URL: {e}")
+            return False
+        except ValueError as e:
+            print(f"MintInstall: Could not parse updated reviews: {e}")
+            return False
+
+        if result is None:
+            print("MintInstall: No new reviews")
+            return True
+
+        if self._cancelled.is_set():
+            return True
+
+        new_reviews, meta, changed = result
+        print("MintInstall: Downloaded new reviews")
+        self._save_cache(new_reviews, meta)
+
+        reviews = self._retain_known_packages(new_reviews)
+        # Tek bir atama ile değiştirilir; okuyucular ya eski ya yeni görüntüyü görür.
+        self._snapshot = ReviewSnapshot(reviews, ranked_names(reviews))
+        if self._package_names is not None:
+            changed = changed & self._package_names
+        if changed:
+            GLib.idle_add(self.emit_reviews_updated, changed)
+        return True
+
+    def emit_reviews_updated(self, changed: Set[str]) -> None:
+        """Güncellemeyi, değişen paketlerle birlikte diğer bileşenlere bildirir."""
+        print(f"MintInstall: Emitting reviews-updated signal ({len(changed)} packages changed)")
+        self.emit("reviews-updated", changed)
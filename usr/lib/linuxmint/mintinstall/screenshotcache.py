@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+# The screenshot manifest: for each package, the screenshots we have on disk
+# (in display order, with where they came from) and the sources that recently
+# had nothing for it. Lookups are a dict access instead of globbing
+# SCREENSHOT_DIR, and housekeeping expires screenshots from it as well.
+#
+# Everything is kept in memory once loaded; changes are written out with save().
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from gi.repository import GLib
+
+from misc import atomic_write
+
+SCREENSHOT_DIR = os.path.join(GLib.get_user_cache_dir(), "mintinstall", "screenshots")
+MANIFEST_PATH = os.path.join(SCREENSHOT_DIR, "manifest.json")
+MANIFEST_VERSION = 1
+MANIFEST_NAME = os.path.basename(MANIFEST_PATH)
+# Screenshots pre-scaled for the details page, one per scale factor. The originals are
+# only decoded again for the enlarged view.
+SCREENSHOT_THUMBNAIL_DIR = os.path.join(SCREENSHOT_DIR, "thumbnails")
+THUMBNAIL_NAME = "%s@%d%s" # name, scale, extension
+THUMBNAIL_NAME_RE = re.compile(r"^(.*)@\d+(\.[^.]*)$")
+
+# A source that had nothing for a package isn't asked again for this long.
+NOT_FOUND_TTL = 3 * (60 * 60 * 24) # days
+# A source that failed (timeout, server error) is given another try after this long.
+FAILURE_TTL = 30 * 60 # minutes
+
+_lock = threading.Lock()
+_packages: Optional[Dict[str, dict]] = None
+
+def thumbnail_path(path: str, scale: int) -> str:
+    """ Where the thumbnail of a screenshot goes: foo_1.png -> thumbnails/foo_1@2.png """
+    name, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(SCREENSHOT_THUMBNAIL_DIR, THUMBNAIL_NAME % (name, scale, ext))
+
+def thumbnail_original(name: str) -> Optional[str]:
+    """ The name of the screenshot a thumbnail was made from: foo_1@2.png -> foo_1.png """
+    match = THUMBNAIL_NAME_RE.match(name)
+    if match is None:
+        return None
+    return match.group(1) + match.group(2)
+
+def _load() -> Dict[str, dict]:
+    global _packages
+    if _packages is None:
+        try:
+            with open(MANIFEST_PATH, "r") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                raise ValueError("unknown version %s" % data.get("version"))
+            _packages = data["packages"]
+        except FileNotFoundError:
+            _packages = {}
+        except (OSError, ValueError, KeyError) as e:
+            print("MintInstall: Could not read screenshot manifest, starting over: %s" % e)
+            _packages = {}
+    return _packages
+
+def _save() -> None:
+    now = time.time()
+    for name in list(_packages.keys()):
+        entry = _packages[name]
+        entry["skip"] = {source: until for source, until in entry.get("skip", {}).items() if until > now}
+        if not entry["skip"] and not entry.get("files"):
+            del _packages[name]
+
+    try:
+        os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+        with atomic_write(MANIFEST_PATH) as f:
+            json.dump({"version": MANIFEST_VERSION, "packages": _packages}, f)
+    except OSError as e:
+        print("MintInstall: Could not save screenshot manifest: %s" % e)
+
+def save() -> None:
+    with _lock:
+        if _packages is not None:
+            _save()
+
+def get_files(name: str) -> List[dict]:
+    """
+    The package's screenshots, in display order: dicts with the local "path",
+    the "source_url" of the full size image (or None), "size" and "fetched".
+    """
+    with _lock:
+        files = _load().get(name, {}).get("files", [])
+        return [dict(f, path=os.path.join(SCREENSHOT_DIR, f["path"])) for f in files]
+
+def add_file(name: str, num: int, path: str, source_url: Optional[str], size: int) -> None:
+    """ Records screenshot number num of a package; not written out until save() """
+    with _lock:
+        files = _load().setdefault(name, {}).setdefault("files", [])
+        files[:] = [f for f in files if f["num"] != num]
+        files.append({
+            "num": num,
+            "path": os.path.basename(path),
+            "source_url": source_url,
+            "size": size,
+            "fetched": time.time()
+        })
+        files.sort(key=lambda f: f["num"])
+
+def forget_files(name: str) -> None:
+    with _lock:
+        entry = _load().get(name)
+        if entry is not None:
+            entry["files"] = []
+
+def referenced_files() -> Set[str]:
+    """ The names of all files in SCREENSHOT_DIR the manifest knows about """
+    with _lock:
+        return {f["path"] for entry in _load().values() for f in entry.get("files", [])}
+
+def expire(max_age: float) -> List[str]:
+    """ Drops the screenshots of every package fetched more than max_age ago, returning their paths """
+    cutoff = time.time() - max_age
+    expired = []
+    with _lock:
+        for entry in _load().values():
+            files = entry.get("files", [])
+            if files and min(f["fetched"] for f in files) < cutoff:
+                # All or nothing, so a package never shows half of its screenshots.
+                expired.extend(os.path.join(SCREENSHOT_DIR, f["path"]) for f in files)
+                entry["files"] = []
+
+        if expired:
+            _save()
+
+    return expired
+
+def sources_to_try(name: str, sources: Iterable[str]) -> List[str]:
+    """ The sources that aren't known to have nothing for the package, or to have just failed """
+    now = time.time()
+    with _lock:
+        skip = _load().get(name, {}).get("skip", {})
+        return [source for source in sources if skip.get(source, 0) <= now]
+
+def record_results(name: str, found: Iterable[str] = (), not_found: Iterable[str] = (), failed: Iterable[str] = ()) -> None:
+    """ Records how each source answered for a package; sources left out stay as they were """
+    now = time.time()
+    with _lock:
+        entry = _load().setdefault(name, {})
+        skip = entry.setdefault("skip", {})
+
+        for source in found:
+            skip.pop(source, None)
+        for source in not_found:
+            skip[source] = now + NOT_FOUND_TTL
+        for source in failed:
+            skip[source] = now + FAILURE_TTL
+
+        _save()